@@ -1,31 +1,166 @@
 # gpt_utils.py
 
+import asyncio
+import hashlib
+import json
 import openai
 import os
+import threading
+import time
+from collections import OrderedDict
 
 # It's good practice to load the key right when you need it
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def generate_gpt_reasoning(ticker, tags, support, resistance):
-    """Generates a brief, bullish narrative using GPT."""
-    if not openai.api_key:
-        return "GPT reasoning not available (API key missing)."
-        
-    prompt = (
+# Shared clients: one httpx pool each, so keep-alive connections are reused
+# across calls. The SDK retries rate limits, timeouts and 5xx responses with
+# exponential backoff.
+_client = openai.OpenAI(api_key=openai.api_key, max_retries=3, timeout=20.0) if openai.api_key else None
+_async_client = openai.AsyncOpenAI(api_key=openai.api_key, max_retries=3, timeout=20.0) if openai.api_key else None
+
+
+# Reasoning cache: normalized (ticker, tags, support, resistance) -> text.
+# Prompts are deterministic (temperature=0), so a hit is as good as a call.
+_REASONING_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_REASONING_CACHE_MAX = 2048
+_REASONING_LOCK = threading.Lock()  # sync callers run on scan/FastAPI threads
+
+# File tier so persisting signals survive restarts without re-querying OpenAI.
+GPT_CACHE_DIR = os.getenv("GPT_CACHE_DIR", os.path.join(os.path.dirname(__file__), "gpt_cache"))
+GPT_CACHE_TTL = int(os.getenv("GPT_CACHE_TTL", str(6 * 3600)))  # seconds
+
+
+def _round2(x):
+    try:
+        return round(float(x), 2)
+    except (TypeError, ValueError):
+        return x
+
+
+def _reasoning_key(ticker, tags, support, resistance):
+    # sorted tags + 2dp levels so near-duplicate inputs share an entry
+    return (str(ticker).upper(), tuple(sorted(set(tags or []))), _round2(support), _round2(resistance))
+
+
+def _cache_path(key):
+    ticker, tags, support, resistance = key
+    digest = hashlib.md5(f"{ticker}|{','.join(tags)}|{support}|{resistance}".encode()).hexdigest()
+    return os.path.join(GPT_CACHE_DIR, f"{digest}.json")
+
+
+def _remember(key, text):
+    with _REASONING_LOCK:
+        _REASONING_CACHE[key] = text
+        _REASONING_CACHE.move_to_end(key)
+        while len(_REASONING_CACHE) > _REASONING_CACHE_MAX:
+            _REASONING_CACHE.popitem(last=False)
+
+
+def _cache_get(key):
+    with _REASONING_LOCK:
+        text = _REASONING_CACHE.get(key)
+        if text is not None:
+            _REASONING_CACHE.move_to_end(key)
+            return text
+
+    path = _cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) <= GPT_CACHE_TTL:
+            with open(path, "r", encoding="utf-8") as f:
+                text = json.load(f).get("text")
+    except (OSError, ValueError):
+        return None
+    if text is not None:
+        _remember(key, text)
+    return text
+
+
+def _cache_put(key, text):
+    _remember(key, text)
+    path = _cache_path(key)
+    try:
+        os.makedirs(GPT_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"text": text}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _build_prompt(ticker, tags, support, resistance):
+    return (
         f"You are a financial analyst. Based on the following data for the stock ticker {ticker}, "
         f"write a concise, 1-2 sentence bullish narrative. "
         f"Key signals detected: {', '.join(tags)}. "
         f"The current support is near ${support} and resistance is near ${resistance}."
     )
+
+
+def generate_gpt_reasoning(ticker, tags, support, resistance):
+    """Generates a brief, bullish narrative using GPT (cached per normalized input, in memory and on disk for GPT_CACHE_TTL)."""
+    if _client is None:
+        return "GPT reasoning not available (API key missing)."
+
+    key = _reasoning_key(ticker, tags, support, resistance)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    prompt = _build_prompt(*key)
     try:
-        response = openai.chat.completions.create(
+        response = _client.chat.completions.create(
             # Correction: Use a valid model name like gpt-4-turbo or gpt-4o
             model="gpt-4-turbo",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=100,
-            temperature=0.7
+            temperature=0.0
+        )
+        text = response.choices[0].message.content.strip()
+        _cache_put(key, text)
+        return text
+    except Exception as e:
+        print(f"Error calling OpenAI: {e}")
+        return "Could not generate GPT reasoning."
+
+
+async def generate_gpt_reasoning_async(ticker, tags, support, resistance):
+    """Async variant of `generate_gpt_reasoning`; shares the same cache."""
+    if _async_client is None:
+        return "GPT reasoning not available (API key missing)."
+
+    key = _reasoning_key(ticker, tags, support, resistance)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    prompt = _build_prompt(*key)
+    try:
+        response = await _async_client.chat.completions.create(
+            model="gpt-4-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=100,
+            temperature=0.0
         )
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        _cache_put(key, text)
+        return text
     except Exception as e:
         print(f"Error calling OpenAI: {e}")
-        return "Could not generate GPT reasoning."
\ No newline at end of file
+        return "Could not generate GPT reasoning."
+
+
+async def batch_generate(items, concurrency: int = 8):
+    """
+    Run `generate_gpt_reasoning_async` for many tickers concurrently, at most
+    `concurrency` requests in flight so large batches don't trip rate limits.
+    `items` is an iterable of dicts with ticker/tags/support/resistance keys;
+    results come back in the same order.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            return await generate_gpt_reasoning_async(**i)
+
+    return await asyncio.gather(*(one(i) for i in items))
@@ -1,10 +1,224 @@
 # app/indicator_utils.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 import ta
 
+# Optional TA-Lib C bindings, used for Bollinger Bands only: its EMA/RSI/MACD
+# are SMA-seeded and would not match the `ta` values the model expects.
+try:
+    import talib  # type: ignore
+    _HAS_TALIB = True
+except Exception:
+    talib = None
+    _HAS_TALIB = False
+
+from app.numba_utils import njit, HAS_NUMBA
+
+
+# ==============================
+# JIT kernels
+# ==============================
+# Same conventions as the `ta` package: EMA seeded from the first value,
+# Wilder RSI (alpha = 1/period, first diff counted as zero) and NaN during
+# each indicator's burn-in.
+# nogil=True lets the scan thread pool run these kernels concurrently.
+
+@njit(cache=True, nogil=True)
+def _ema_loop(x, period, out):
+    n = x.shape[0]
+    if n == 0:
+        return out
+    alpha = 2.0 / (period + 1.0)
+    out[0] = x[0]
+    for i in range(1, n):
+        out[i] = alpha * x[i] + (1.0 - alpha) * out[i - 1]
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rsi_loop(x, period, out):
+    n = x.shape[0]
+    out[:] = np.nan
+    alpha = 1.0 / period
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n):
+        d = x[i] - x[i - 1]
+        gain = d if d > 0.0 else 0.0
+        loss = -d if d < 0.0 else 0.0
+        avg_gain = alpha * gain + (1.0 - alpha) * avg_gain
+        avg_loss = alpha * loss + (1.0 - alpha) * avg_loss
+        if i >= period - 1:
+            if avg_loss == 0.0:
+                out[i] = 100.0
+            else:
+                out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _macd_loop(x, fast, slow, signal, macd_out, signal_out):
+    n = x.shape[0]
+    macd_out[:] = np.nan
+    signal_out[:] = np.nan
+    if n == 0:
+        return macd_out, signal_out
+    a_fast = 2.0 / (fast + 1.0)
+    a_slow = 2.0 / (slow + 1.0)
+    a_sig = 2.0 / (signal + 1.0)
+    ema_fast = x[0]
+    ema_slow = x[0]
+    sig = 0.0
+    for i in range(1, n):
+        ema_fast = a_fast * x[i] + (1.0 - a_fast) * ema_fast
+        ema_slow = a_slow * x[i] + (1.0 - a_slow) * ema_slow
+        if i >= slow - 1:
+            m = ema_fast - ema_slow
+            macd_out[i] = m
+            # signal line starts from the first valid MACD value
+            sig = m if i == slow - 1 else a_sig * m + (1.0 - a_sig) * sig
+            if i >= slow + signal - 2:
+                signal_out[i] = sig
+    return macd_out, signal_out
+
+
+@njit(cache=True, nogil=True)
+def _bbands_loop(x, window, n_std, mid_out, high_out, low_out):
+    """Bollinger Bands: rolling mean +/- n_std * population std (ddof=0)."""
+    n = x.shape[0]
+    mid_out[:] = np.nan
+    high_out[:] = np.nan
+    low_out[:] = np.nan
+    for i in range(window - 1, n):
+        s = 0.0
+        for j in range(i - window + 1, i + 1):
+            s += x[j]
+        m = s / window
+        v = 0.0
+        for j in range(i - window + 1, i + 1):
+            v += (x[j] - m) * (x[j] - m)
+        dev = n_std * np.sqrt(v / window)
+        mid_out[i] = m
+        high_out[i] = m + dev
+        low_out[i] = m - dev
+    return mid_out, high_out, low_out
+
+
+@njit(cache=True, nogil=True)
+def _seed_recurrences(x):
+    """
+    Final (ema5, ema20, ema12, ema26, macd_signal, rsi_gain, rsi_loss) after
+    one pass over `x`, with the same seeding as _ema_loop/_macd_loop/_rsi_loop.
+    The signal line falls back to the last MACD when `x` is too short for it.
+    """
+    a5 = 2.0 / 6.0
+    a20 = 2.0 / 21.0
+    a12 = 2.0 / 13.0
+    a26 = 2.0 / 27.0
+    a_sig = 2.0 / 10.0
+    a_rsi = 1.0 / 14.0
+    e5 = e20 = e12 = e26 = x[0]
+    sig = 0.0
+    gain = 0.0
+    loss = 0.0
+    for i in range(1, x.shape[0]):
+        c = x[i]
+        d = c - x[i - 1]
+        gain = a_rsi * (d if d > 0.0 else 0.0) + (1.0 - a_rsi) * gain
+        loss = a_rsi * (-d if d < 0.0 else 0.0) + (1.0 - a_rsi) * loss
+        e5 = a5 * c + (1.0 - a5) * e5
+        e20 = a20 * c + (1.0 - a20) * e20
+        e12 = a12 * c + (1.0 - a12) * e12
+        e26 = a26 * c + (1.0 - a26) * e26
+        if i >= 25:
+            m = e12 - e26
+            sig = m if i == 25 else a_sig * m + (1.0 - a_sig) * sig
+    if x.shape[0] < 26:
+        sig = e12 - e26
+    return e5, e20, e12, e26, sig, gain, loss
+
+
+def _ema(x: np.ndarray, period: int) -> np.ndarray:
+    out = _ema_loop(x, period, np.empty_like(x))
+    out[: period - 1] = np.nan
+    return out
+
+
+def _ema_array(x: np.ndarray, period: int) -> np.ndarray:
+    """EMA of a float64 array (`ta` convention) using the fastest available backend."""
+    if HAS_NUMBA:
+        return _ema(x, period)
+    return ta.trend.EMAIndicator(close=pd.Series(x), window=period).ema_indicator().to_numpy()
+
+
+if HAS_NUMBA:
+    # Pay the compile (or cache load) cost at import, not on the first scan.
+    _warm = np.zeros(2, dtype=np.float64)
+    _ema_loop(_warm, 2, np.empty_like(_warm))
+    _rsi_loop(_warm, 2, np.empty_like(_warm))
+    _macd_loop(_warm, 2, 3, 2, np.empty_like(_warm), np.empty_like(_warm))
+    _bbands_loop(_warm, 2, 2.0, np.empty_like(_warm), np.empty_like(_warm), np.empty_like(_warm))
+    _seed_recurrences(_warm)
+    del _warm
+
 # ==============================
 # Indicator calculation
 # ==============================
+def _bollinger(close: pd.Series, window: int, n_std: float):
+    """(mid, high, low) bands; same values as ta's BollingerBands from one rolling pass."""
+    roll = close.rolling(window)
+    mid = roll.mean()
+    dev = roll.std(ddof=0) * n_std
+    return mid, mid + dev, mid - dev
+
+
+def indicator_arrays(close_arr: np.ndarray, bb_window: int = 20, bb_std: float = 2.0) -> Dict[str, np.ndarray]:
+    """
+    Core indicators over a float64 close array, as plain ndarrays keyed by
+    column name (rsi, ema5, ema20, macd, macd_signal, bb_mid, bb_high, bb_low).
+    Callers that only need the last bar or two can index these directly
+    instead of going through a DataFrame.
+    """
+    if HAS_NUMBA:
+        macd, macd_signal = _macd_loop(close_arr, 12, 26, 9, np.empty_like(close_arr), np.empty_like(close_arr))
+        out = {
+            "rsi": _rsi_loop(close_arr, 14, np.empty_like(close_arr)),
+            "ema5": _ema(close_arr, 5),
+            "ema20": _ema(close_arr, 20),
+            "macd": macd,
+            "macd_signal": macd_signal,
+        }
+    else:
+        close = pd.Series(close_arr)
+        macd_indicator = ta.trend.MACD(close=close)
+        out = {
+            # Momentum / trend
+            "rsi": ta.momentum.RSIIndicator(close=close, window=14).rsi().to_numpy(),
+            "ema5": ta.trend.EMAIndicator(close=close, window=5).ema_indicator().to_numpy(),
+            "ema20": ta.trend.EMAIndicator(close=close, window=20).ema_indicator().to_numpy(),
+            "macd": macd_indicator.macd().to_numpy(),
+            "macd_signal": macd_indicator.macd_signal().to_numpy(),
+        }
+
+    # Bollinger Bands (for quick reversal setups): SMA +/- population std on
+    # every backend, so TA-Lib's C version gives the same values.
+    if _HAS_TALIB:
+        upper, mid, lower = talib.BBANDS(close_arr, timeperiod=bb_window, nbdevup=bb_std, nbdevdn=bb_std, matype=0)
+    elif HAS_NUMBA:
+        mid, upper, lower = _bbands_loop(
+            close_arr, bb_window, bb_std,
+            np.empty_like(close_arr), np.empty_like(close_arr), np.empty_like(close_arr),
+        )
+    else:
+        mid, upper, lower = (b.to_numpy() for b in _bollinger(pd.Series(close_arr), bb_window, bb_std))
+    out.update(bb_mid=mid, bb_high=upper, bb_low=lower)
+    return out
+
+
 def calculate_indicators(df: pd.DataFrame, bb_window: int = 20, bb_std: float = 2.0) -> pd.DataFrame:
     """
     Calculates core technical indicators and adds them to the DataFrame.
@@ -15,38 +229,177 @@ def calculate_indicators(df: pd.DataFrame, bb_window: int = 20, bb_std: float =
       - ema5, ema20
       - macd, macd_signal
       - bb_mid, bb_high, bb_low (Bollinger Bands, window=20, std=2 by default)
+
+    Leading bars inside each indicator's warm-up window are left as NaN.
     """
-    close = df["Close"]
+    close_arr = df["Close"].to_numpy(dtype=np.float64)
+    for name, values in indicator_arrays(close_arr, bb_window, bb_std).items():
+        df[name] = values
+    return df
+
 
-    # Momentum / trend
-    df["rsi"] = ta.momentum.RSIIndicator(close=close, window=14).rsi()
-    df["ema5"] = ta.trend.EMAIndicator(close=close, window=5).ema_indicator()
-    df["ema20"] = ta.trend.EMAIndicator(close=close, window=20).ema_indicator()
+# ==============================
+# Incremental (streaming) indicator state
+# ==============================
+# ticker -> recurrence state as of the last *completed* bar seen. A new bar then
+# costs one constant-time update per indicator instead of a full-window
+# recompute; the still-forming last bar is applied on top without being stored.
+# Same `ta`/JIT conventions (first-value EMA seed, Wilder RSI from zero) as
+# `indicator_arrays`, so intraday and daily features are defined alike.
+_INDICATOR_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_INDICATOR_CACHE_MAX = 2048
+_INDICATOR_LOCK = threading.Lock()
+_BB_WINDOW = 20
+_STATE_MIN_BARS = 26 + 9 - 1  # first bar with a valid MACD signal (slow + signal - 1)
+_BB_STD = 2.0
 
-    macd_indicator = ta.trend.MACD(close=close)
-    df["macd"] = macd_indicator.macd()
-    df["macd_signal"] = macd_indicator.macd_signal()
 
-    # Bollinger Bands (for quick reversal setups)
-    bb = ta.volatility.BollingerBands(close=close, window=bb_window, window_dev=bb_std)
-    df["bb_mid"] = bb.bollinger_mavg()
-    df["bb_high"] = bb.bollinger_hband()
-    df["bb_low"]  = bb.bollinger_lband()
+def _rsi_from(avg_gain: float, avg_loss: float) -> float:
+    if avg_loss == 0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
 
-    # Fill small gaps
-    df.bfill(inplace=True)
-    df.ffill(inplace=True)
-    return df
+
+def _state_values(st: Dict[str, Any]) -> Dict[str, float]:
+    win = st["bb_window"]
+    if len(win) == _BB_WINDOW:
+        mid = sum(win) / _BB_WINDOW
+        dev = _BB_STD * (sum((x - mid) ** 2 for x in win) / _BB_WINDOW) ** 0.5
+        bb_mid, bb_high, bb_low = mid, mid + dev, mid - dev
+    else:
+        bb_mid = bb_high = bb_low = float("nan")
+    return {
+        "Close": st["close"],
+        "rsi": _rsi_from(st["rsi_gain"], st["rsi_loss"]),
+        "ema5": st["ema5"],
+        "ema20": st["ema20"],
+        "macd": st["macd_ema12"] - st["macd_ema26"],
+        "macd_signal": st["macd_signal"],
+        "bb_mid": bb_mid,
+        "bb_high": bb_high,
+        "bb_low": bb_low,
+    }
+
+
+def _step(st: Dict[str, Any], c: float) -> Dict[str, Any]:
+    """Recurrence state after one more bar closing at `c` (`st` is not modified)."""
+    nxt = dict(st)
+    d = c - st["close"]
+    a_rsi = 1.0 / 14
+    nxt["rsi_gain"] = a_rsi * max(d, 0.0) + (1.0 - a_rsi) * st["rsi_gain"]
+    nxt["rsi_loss"] = a_rsi * max(-d, 0.0) + (1.0 - a_rsi) * st["rsi_loss"]
+
+    for key, period in (("ema5", 5), ("ema20", 20), ("macd_ema12", 12), ("macd_ema26", 26)):
+        alpha = 2.0 / (period + 1.0)
+        nxt[key] = alpha * c + (1.0 - alpha) * st[key]
+
+    a_sig = 2.0 / (9 + 1.0)
+    nxt["macd_signal"] = a_sig * (nxt["macd_ema12"] - nxt["macd_ema26"]) + (1.0 - a_sig) * st["macd_signal"]
+
+    nxt["bb_window"] = (st["bb_window"] + [c])[-_BB_WINDOW:]
+    nxt["close"] = c
+    return nxt
+
+
+def seed_indicator_state(ticker: str, df: pd.DataFrame) -> Optional[Dict[str, float]]:
+    """
+    Fold every bar of `df` except the last into the EMA/RSI/MACD recurrences
+    (one pass) and cache that state for `ticker`, keyed by its last bar.
+    The last bar may still be forming, so it is never committed; pass the
+    same frame to `advance_indicator_state` to get its values.
+    Returns the committed indicator values (same keys as `incremental_update`).
+    """
+    if df is None or len(df) < _STATE_MIN_BARS:
+        return None  # still inside the MACD-signal warm-up
+    close_arr = df["Close"].to_numpy(dtype=np.float64)[:-1]
+    ema5, ema20, ema12, ema26, signal, gain, loss = _seed_recurrences(close_arr)
+
+    st = {
+        "last_ts": df.index[-2],
+        "close": float(close_arr[-1]),
+        "ema5": float(ema5),
+        "ema20": float(ema20),
+        "rsi_gain": float(gain),
+        "rsi_loss": float(loss),
+        "macd_ema12": float(ema12),
+        "macd_ema26": float(ema26),
+        "macd_signal": float(signal),
+        "bb_window": [float(x) for x in close_arr[-_BB_WINDOW:]],
+    }
+
+    with _INDICATOR_LOCK:
+        _INDICATOR_CACHE[ticker] = st
+        _INDICATOR_CACHE.move_to_end(ticker)
+        while len(_INDICATOR_CACHE) > _INDICATOR_CACHE_MAX:
+            _INDICATOR_CACHE.popitem(last=False)
+    return _state_values(st)
+
+
+def incremental_update(ticker: str, new_close: float, ts: Any = None) -> Optional[Dict[str, float]]:
+    """
+    Commit one completed bar to the cached indicator state for `ticker`.
+
+    Returns None on a cache miss (call `seed_indicator_state` first). If `ts`
+    is given and not newer than the cached bar, the state is left untouched
+    and the current values are returned.
+    """
+    with _INDICATOR_LOCK:
+        st = _INDICATOR_CACHE.get(ticker)
+        if st is None:
+            return None
+        _INDICATOR_CACHE.move_to_end(ticker)
+        if ts is not None and st["last_ts"] is not None and ts <= st["last_ts"]:
+            return _state_values(st)
+        st = _step(st, float(new_close))
+        st["last_ts"] = ts
+        _INDICATOR_CACHE[ticker] = st
+        return _state_values(st)
+
+
+def advance_indicator_state(ticker: str, df: pd.DataFrame) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+    """
+    Commit the completed bars of `df` newer than the cached state for `ticker`,
+    then apply its last (possibly still-forming) bar without committing it.
+    Returns (latest, previous) indicator values: the last bar and the one before.
+
+    Returns None when the state must be re-seeded instead: no cached state,
+    the cached bar is outside `df` (or is its last bar), or its close was
+    revised since it was committed.
+    """
+    if df is None or len(df) < 2:
+        return None
+    with _INDICATOR_LOCK:
+        st = _INDICATOR_CACHE.get(ticker)
+        last_ts = st["last_ts"] if st else None
+        last_close = st["close"] if st else None
+    if last_ts is None or not (df.index[0] <= last_ts < df.index[-1]):
+        return None
+    try:
+        if float(df.at[last_ts, "Close"]) != last_close:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    closes = df["Close"].to_numpy(dtype=np.float64)
+    new = df.index > last_ts
+    for ts, c in zip(df.index[new][:-1], closes[new][:-1]):
+        incremental_update(ticker, c, ts)
+
+    with _INDICATOR_LOCK:
+        st = _INDICATOR_CACHE.get(ticker)
+        if st is None:
+            return None
+        return _state_values(_step(st, float(closes[-1]))), _state_values(st)
 
 
 # ==============================
 # Strategy / pattern detection
 # ==============================
-def detect_strategies(row: pd.Series) -> list[str]:
+def detect_strategies(row: pd.Series, prev_row: Optional[pd.Series] = None) -> list[str]:
     """
     Detects bullish trading strategy tags for the *latest* row.
-    NOTE: Because only the latest row is provided, true crossovers that
-    require the previous candle are approximated (same as existing logic).
+    Crossover tags compare against `prev_row` (the bar before `row`) and are
+    skipped when it is not provided.
 
     Adds Bollinger-based tags that don't require the previous candle:
       - "BB Lower Touch" (price <= lower band)
@@ -56,31 +409,35 @@ def detect_strategies(row: pd.Series) -> list[str]:
     """
     tags: list[str] = []
 
-    # Guard for the crossover checks (kept for backward compatibility)
-    try:
-        prev_ema5 = row.shift(1)["ema5"]  # will be NaN when only latest is passed
-        prev_macd = row.shift(1)["macd"]
-        prev_macd_sig = row.shift(1)["macd_signal"]
-    except Exception:
-        prev_ema5 = prev_macd = prev_macd_sig = pd.NA
+    # Plain dicts: much cheaper per .get() than pandas label lookups.
+    r = row.to_dict() if isinstance(row, pd.Series) else dict(row)
+
+    if prev_row is not None:
+        p = prev_row.to_dict() if isinstance(prev_row, pd.Series) else dict(prev_row)
+        prev_ema5 = p.get("ema5")
+        prev_ema20 = p.get("ema20")
+        prev_macd = p.get("macd")
+        prev_macd_sig = p.get("macd_signal")
+    else:
+        prev_ema5 = prev_ema20 = prev_macd = prev_macd_sig = pd.NA
 
     if pd.isna(prev_ema5):
         # can't reliably check crossovers without prior row; fall through to BB/RSI tags
         pass
     else:
-        # Existing tags (unchanged)
-        if row.get("rsi", 50) < 35:
+        if r.get("rsi", 50) < 35:
             tags.append("RSI Oversold")
-        if row.get("ema5", 0) > row.get("ema20", 0) and prev_ema5 <= row.shift(1)["ema20"]:
+        if r.get("ema5", 0) > r.get("ema20", 0) and pd.notna(prev_ema20) and prev_ema5 <= prev_ema20:
             tags.append("EMA Bullish Crossover")
-        if row.get("macd", 0) > row.get("macd_signal", 0) and prev_macd <= prev_macd_sig:
+        if r.get("macd", 0) > r.get("macd_signal", 0) and pd.notna(prev_macd) and pd.notna(prev_macd_sig) \
+                and prev_macd <= prev_macd_sig:
             tags.append("MACD Bullish Crossover")
 
     # --- New: Bollinger/RSI quick-reversal cues (do not need previous bar) ---
-    close = row.get("Close")
-    bb_low = row.get("bb_low")
-    bb_high = row.get("bb_high")
-    rsi = row.get("rsi")
+    close = r.get("Close")
+    bb_low = r.get("bb_low")
+    bb_high = r.get("bb_high")
+    rsi = r.get("rsi")
 
     if pd.notna(close) and pd.notna(bb_low) and close <= bb_low:
         tags.append("BB Lower Touch")
@@ -92,47 +449,82 @@ def detect_strategies(row: pd.Series) -> list[str]:
         if pd.notna(rsi) and rsi > 65:
             tags.append("BB Upper + RSI Overbought")
 
-    return list(dict.fromkeys(tags))  # de-dupe while preserving order
+    return tags  # each tag is appended at most once, so no de-dupe needed
 
 
 def calculate_support_resistance(df: pd.DataFrame) -> tuple[float, float]:
     """
     Basic support/resistance from recent price action (last 14 bars).
     """
-    support = df["Low"].rolling(window=14, min_periods=1).min().iloc[-1]
-    resistance = df["High"].rolling(window=14, min_periods=1).max().iloc[-1]
+    # Only the last window matters, so reduce the tail directly instead of
+    # building full rolling min/max columns.
+    support = np.nanmin(df["Low"].to_numpy(dtype=np.float64)[-14:])
+    resistance = np.nanmax(df["High"].to_numpy(dtype=np.float64)[-14:])
     return round(float(support), 2), round(float(resistance), 2)
 
 
-def detect_candles(df: pd.DataFrame) -> list[str]:
+def _pattern_masks(o, h, l, c, po, pc) -> Dict[str, np.ndarray]:
+    """Pattern masks for aligned bar arrays, given each bar's previous open/close."""
+    body = np.abs(c - o)
+    lower_shadow = np.minimum(o, c) - l
+    upper_shadow = h - np.maximum(o, c)
+
+    engulfing = (pc < po) & (c > o) & (c > po) & (o < pc)
+    hammer = (body > 0) & (lower_shadow > 2 * body) & (upper_shadow < body)
+
+    return {"Bullish Engulfing": engulfing, "Hammer": hammer}
+
+
+def candle_pattern_masks(df: pd.DataFrame) -> Dict[str, np.ndarray]:
     """
-    Detect basic bullish candlestick patterns on the latest candle.
-    Currently: Bullish Engulfing, Hammer.
+    Boolean masks (one entry per bar) for each supported bullish pattern,
+    computed in a single vectorized pass over the OHLC columns.
     """
-    patterns: list[str] = []
-    if len(df) < 2:
-        return patterns
+    o = df["Open"].to_numpy(dtype=np.float64)
+    h = df["High"].to_numpy(dtype=np.float64)
+    l = df["Low"].to_numpy(dtype=np.float64)
+    c = df["Close"].to_numpy(dtype=np.float64)
+
+    # The first bar has no predecessor; NaN makes every engulfing comparison False
+    po = np.concatenate(([np.nan], o[:-1]))
+    pc = np.concatenate(([np.nan], c[:-1]))
+    return _pattern_masks(o, h, l, c, po, pc)
 
-    latest = df.iloc[-1]
-    prev = df.iloc[-2]
 
-    # Bullish Engulfing
-    if (prev["Close"] < prev["Open"]) and \
-       (latest["Close"] > latest["Open"]) and \
-       (latest["Close"] > prev["Open"]) and \
-       (latest["Open"] < prev["Close"]):
-        patterns.append("Bullish Engulfing")
+def screen_candles(frames: Dict[str, Any]) -> Dict[str, list[str]]:
+    """
+    Latest-bar pattern tags per ticker, for tickers with at least one match
+    (same tags as `detect_candles`). Stacks the last two bars of every frame
+    and evaluates the patterns across all tickers in one NumPy pass, so
+    indicator work can be limited to these.
+    Entries that aren't usable frames (fetch errors, too few bars) are ignored.
+    """
+    names, rows = [], []
+    for ticker, df in frames.items():
+        if isinstance(df, pd.DataFrame) and len(df) >= 2:
+            names.append(ticker)
+            rows.append(df[["Open", "High", "Low", "Close"]].to_numpy(dtype=np.float64)[-2:])
+    if not rows:
+        return {}
 
-    body = abs(latest["Close"] - latest["Open"])
-    if body == 0:
-        return patterns
+    bars = np.stack(rows)  # (tickers, 2 bars, OHLC)
+    prev, last = bars[:, 0], bars[:, 1]
+    masks = _pattern_masks(last[:, 0], last[:, 1], last[:, 2], last[:, 3], prev[:, 0], prev[:, 3])
+    hits: Dict[str, list[str]] = {}
+    for name, mask in masks.items():
+        for i in np.flatnonzero(mask):
+            hits.setdefault(names[i], []).append(name)
+    return hits
 
-    lower_shadow = min(latest["Open"], latest["Close"]) - latest["Low"]
-    upper_shadow = latest["High"] - max(latest["Open"], latest["Close"])
-    if lower_shadow > 2 * body and upper_shadow < body:
-        patterns.append("Hammer")
 
-    return patterns
+def detect_candles(df: pd.DataFrame) -> list[str]:
+    """
+    Detect basic bullish candlestick patterns on the latest candle.
+    Currently: Bullish Engulfing, Hammer.
+    """
+    if len(df) < 2:
+        return []
+    return [name for name, mask in candle_pattern_masks(df).items() if mask[-1]]
 
 
 # ==============================
@@ -150,10 +542,11 @@ def daily_trend_bias(daily_df: pd.DataFrame, lookback: int = 3) -> str | None:
     if daily_df is None or len(daily_df) < max(lookback + 1, 25):
         return None
 
-    tmp = daily_df.copy()
-    tmp = calculate_indicators(tmp)  # ensures ema20 exists on daily timeframe
-    ema20_now = float(tmp["ema20"].iloc[-1])
-    ema20_prev = float(tmp["ema20"].iloc[-1 - lookback])
+    # Only EMA20 is needed: compute it on the close array without copying
+    # the frame or running the full indicator set.
+    ema20 = _ema_array(daily_df["Close"].to_numpy(dtype=np.float64), 20)
+    ema20_now = float(ema20[-1])
+    ema20_prev = float(ema20[-1 - lookback])
 
     if ema20_now > ema20_prev:
         return "Daily Uptrend"
@@ -1,22 +1,40 @@
 # app/main.py (v1.3.4)
+import asyncio
+import hashlib
+import hmac
+import json
 import os
+import threading
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Dict, Any, List, Tuple
 
-from fastapi import FastAPI, HTTPException, Depends, Query
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request
+from fastapi.responses import RedirectResponse, Response
+from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, ValidationError
 from sqlalchemy import select, desc, func, and_
+from sqlalchemy.orm import aliased
 import zoneinfo
 
-from app.models import get_db, Signal, Outcome, PriceCheck
+try:
+    import orjson  # type: ignore
+    _HAS_ORJSON = True
+except Exception:
+    orjson = None
+    _HAS_ORJSON = False
+
+from app.models import get_db, SessionLocal, Signal, Outcome
 from app.polygon_api import get_ohlcv
 
 # Optional chart generation
 try:
-    from app.ml_utils import generate_chart
+    from app.ml_utils import generate_chart, chart_json
 except Exception:
     generate_chart = None
+    chart_json = None
 
 LONDON = zoneinfo.ZoneInfo("Europe/London")
 
@@ -38,6 +56,79 @@ def root():
 CHARTS_DIR = os.getenv("CHARTS_DIR", "charts")
 os.makedirs(CHARTS_DIR, exist_ok=True)
 
+# Snapshot of existing chart files: (refreshed_at, names). One scandir every
+# couple of seconds instead of a stat per lookup.
+_CHART_INDEX_TTL = 2.0
+_chart_index: Tuple[float, frozenset] = (0.0, frozenset())
+_chart_index_lock = threading.Lock()
+
+
+def _chart_names() -> frozenset:
+    global _chart_index
+    with _chart_index_lock:
+        ts, names = _chart_index
+        if time.monotonic() - ts > _CHART_INDEX_TTL:
+            with os.scandir(CHARTS_DIR) as it:
+                names = frozenset(e.name for e in it if e.name.endswith("_chart.html"))
+            _chart_index = (time.monotonic(), names)
+        return names
+
+
+def _mark_chart(name: str) -> None:
+    global _chart_index
+    with _chart_index_lock:
+        ts, names = _chart_index
+        _chart_index = (ts, names | {name})
+
+
+# ---------- response models ----------
+# Declared as response_model so the endpoints have a documented shape.
+# Loosely-typed DB/GPT values are coerced in _serialize_signal; rows that
+# still don't validate are skipped by _serialize_pairs.
+class OutcomeOut(BaseModel):
+    status: str
+    deadline: Optional[str] = None
+    target_met_at: Optional[str] = None
+
+
+class SignalOut(BaseModel):
+    id: str
+    created_at: Optional[str] = None
+    ticker: Optional[str] = None
+    company_name: Any = None
+    sector: Any = None
+    timeframe: Any = None
+    ml_proba: Optional[float] = None
+    support: Optional[float] = None
+    resistance: Optional[float] = None
+    all_tags: List[Any] = []
+    strategy_tags: List[Any] = []
+    candle_tags: List[Any] = []
+    direction: Optional[str] = None
+    risk_reward: Optional[float] = None
+    reward_pct: Optional[float] = None
+    risk_pct: Optional[float] = None
+    price_at_signal: Optional[float] = None
+    target_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    stars: Optional[int] = None
+    gpt_rank: Optional[int] = None
+    is_top_pick: Optional[bool] = None
+    horizon_days: Optional[int] = None
+    indicators: Dict[str, Any] = {}
+    reason: Any = None
+    window_tag: Optional[str] = None
+    outcome: Optional[OutcomeOut] = None
+
+
+class ProgressOut(BaseModel):
+    last_price: float
+    change_pct: float
+
+
+class SignalProgressOut(SignalOut):
+    progress: ProgressOut
+
 
 # ---------- helpers ----------
 def _num(x):
@@ -47,6 +138,15 @@ def _num(x):
         return None
 
 
+def _int(x):
+    f = _num(x)
+    return int(round(f)) if f is not None and f == f else None
+
+
+def _str(x):
+    return str(x) if x is not None else None
+
+
 def _latest_outcome(db, signal_id):
     q = (
         select(Outcome)
@@ -57,6 +157,43 @@ def _latest_outcome(db, signal_id):
     return db.execute(q).scalars().first()
 
 
+def _latest_outcomes(db, signal_ids) -> Dict[str, Outcome]:
+    """Latest Outcome per signal for many signals in one query (keyed by str(signal_id))."""
+    ids = list(signal_ids)
+    if not ids:
+        return {}
+    rn = func.row_number().over(
+        partition_by=Outcome.signal_id,
+        order_by=desc(Outcome.created_at),
+    ).label("rn")
+    sub = select(Outcome, rn).where(Outcome.signal_id.in_(ids)).subquery()
+    latest = aliased(Outcome, sub)
+    q = select(latest).where(sub.c.rn == 1)
+    return {str(o.signal_id): o for o in db.execute(q).scalars().all()}
+
+
+def _serialize_pairs(pairs) -> List[SignalOut]:
+    """Serialize (Signal, Outcome) pairs, skipping rows that don't fit SignalOut."""
+    out = []
+    for s, o in pairs:
+        try:
+            out.append(_serialize_signal(s, o))
+        except ValidationError as e:
+            print(f"Skipping signal {s.id}: {e}")
+    return out
+
+
+def _serialize_many(db, rows) -> List[SignalOut]:
+    outcomes = _latest_outcomes(db, [s.id for s in rows])
+    return _serialize_pairs((s, outcomes.get(str(s.id))) for s in rows)
+
+
+def _dumps(obj) -> bytes:
+    if _HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
 def _as_list(v):
     if v is None:
         return []
@@ -105,7 +242,7 @@ def _risk_reward(entry: Optional[float], tp: Optional[float], sl: Optional[float
         return None, None, None
 
 
-def _serialize_signal(sig: Signal, outcome: Optional[Outcome]) -> Dict[str, Any]:
+def _serialize_signal(sig: Signal, outcome: Optional[Outcome]) -> SignalOut:
     indicators = sig.indicators_json or {}
 
     # Lift commonly-used fields to top-level for convenience
@@ -133,12 +270,12 @@ def _serialize_signal(sig: Signal, outcome: Optional[Outcome]) -> Dict[str, Any]
         direction = (sig.reason_json or {}).get("direction")
     except Exception:
         direction = None
-    if not direction:
+    if not direction or not isinstance(direction, str):
         direction = _infer_direction(entry, tp, fallback="long")
 
     rr, reward_pct, risk_pct = _risk_reward(entry, tp, sl, direction)
 
-    return {
+    return SignalOut.model_validate({
         "id": str(sig.id),
         "created_at": sig.created_at.isoformat() if sig.created_at else None,
         "ticker": sig.ticker,
@@ -158,19 +295,19 @@ def _serialize_signal(sig: Signal, outcome: Optional[Outcome]) -> Dict[str, Any]
         "price_at_signal": entry,
         "target_price": tp,
         "stop_loss": sl,
-        "stars": sig.stars,
-        "gpt_rank": sig.gpt_rank,
+        "stars": _int(sig.stars),
+        "gpt_rank": _int(sig.gpt_rank),
         "is_top_pick": sig.is_top_pick,
-        "horizon_days": sig.horizon_days,
+        "horizon_days": _int(sig.horizon_days),
         "indicators": indicators,
         "reason": sig.reason_json,
-        "window_tag": sig.window_tag,
+        "window_tag": _str(sig.window_tag),
         "outcome": {
             "status": outcome.status if outcome else "PENDING",
             "deadline": outcome.deadline.isoformat() if outcome and outcome.deadline else None,
             "target_met_at": outcome.target_met_at.isoformat() if outcome and outcome.target_met_at else None,
         } if outcome else None,
-    }
+    })
 
 
 # ---------- base endpoints ----------
@@ -178,13 +315,51 @@ def _serialize_signal(sig: Signal, outcome: Optional[Outcome]) -> Dict[str, Any]
 def health():
     return {"ok": True, "now": datetime.utcnow().isoformat() + "Z"}
 
-# Optional alias for frontend that calls /signals/latest
-@app.get("/signals")
+# Encoded /signals bodies keyed by limit: {limit: (stored_at, body)}.
+# The payload only changes when the scanner writes, so a short TTL is safe.
+# Invalidation bumps _signals_cache_gen, and a body built before the bump is
+# not stored. The cache is per process: /internal/cache/invalidate reaches
+# only the worker that serves it, so with several workers the others fall
+# back to the TTL (run a single worker, or keep SIGNALS_CACHE_TTL short).
+SIGNALS_CACHE_TTL = float(os.getenv("SIGNALS_CACHE_TTL", "30"))
+_signals_cache: Dict[int, Tuple[float, bytes]] = {}
+_signals_cache_gen = 0
+_signals_cache_lock = threading.Lock()
+
+
+# Optional alias for frontend that calls /signals/latest.
+# Returns pre-encoded bytes, so the schema is documented via `responses`.
+@app.get("/signals", response_model=None, responses={200: {"model": List[SignalOut]}})
 def signals_alias(db=Depends(get_db), limit: int = Query(50, ge=1, le=500)):
-    return latest_signals(limit=limit, db=db)
-
+    with _signals_cache_lock:
+        hit = _signals_cache.get(limit)
+        gen = _signals_cache_gen
+    if hit and time.monotonic() - hit[0] < SIGNALS_CACHE_TTL:
+        return Response(content=hit[1], media_type="application/json")
 
-@app.get("/signals/latest")
+    q = select(Signal).order_by(desc(Signal.created_at)).limit(limit)
+    rows = db.execute(q).scalars().all()
+    body = _dumps([item.model_dump() for item in _serialize_many(db, rows)])
+    with _signals_cache_lock:
+        if gen == _signals_cache_gen:  # no invalidation while this body was built
+            _signals_cache[limit] = (time.monotonic(), body)
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/internal/cache/invalidate", include_in_schema=False)
+def invalidate_cache(x_internal_token: Optional[str] = Header(None)):
+    """Called by the scanner after it writes new signals (requires INTERNAL_TOKEN on both sides)."""
+    global _signals_cache_gen
+    token = os.getenv("INTERNAL_TOKEN")
+    if not token or not hmac.compare_digest(x_internal_token or "", token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    with _signals_cache_lock:
+        _signals_cache_gen += 1
+        _signals_cache.clear()
+    return {"ok": True}
+
+
+@app.get("/signals/latest", response_model=List[SignalOut])
 def latest_signals(
     limit: int = Query(50, ge=1, le=500),
     only_top: bool = Query(False),
@@ -195,10 +370,10 @@ def latest_signals(
         q = q.where(Signal.is_top_pick == True)  # noqa: E712
     q = q.order_by(desc(Signal.created_at)).limit(limit)
     rows = db.execute(q).scalars().all()
-    return [_serialize_signal(s, _latest_outcome(db, s.id)) for s in rows]
+    return _serialize_many(db, rows)
 
 
-@app.get("/signals/top5")
+@app.get("/signals/top5", response_model=List[SignalOut])
 def top5(db=Depends(get_db)):
     q = (
         select(Signal)
@@ -207,41 +382,45 @@ def top5(db=Depends(get_db)):
         .limit(5)
     )
     rows = db.execute(q).scalars().all()
-    return [_serialize_signal(s, _latest_outcome(db, s.id)) for s in rows]
+    return _serialize_many(db, rows)
+
+
+def _days_between(end_col, start_col, dialect_name: str):
+    """SQL expression for (end - start) in fractional days."""
+    if dialect_name == "sqlite":
+        return func.julianday(end_col) - func.julianday(start_col)
+    return func.extract("epoch", end_col - start_col) / 86400.0
 
 
 @app.get("/stats/summary")
 def stats_summary(db=Depends(get_db)):
-    total_signals = db.execute(select(func.count(Signal.id))).scalar() or 0
-    total_top = db.execute(select(func.count(Signal.id)).where(Signal.is_top_pick == True)).scalar() or 0  # noqa
+    # One round-trip: conditional aggregates over outcomes (joined to their
+    # signal for the days-to-target average) plus signal totals as subqueries.
+    total_signals_sq = select(func.count(Signal.id)).scalar_subquery()
+    total_top_sq = select(func.count(Signal.id)).where(Signal.is_top_pick == True).scalar_subquery()  # noqa: E712
+    days_to_target = _days_between(Outcome.target_met_at, Signal.created_at, db.get_bind().dialect.name)
 
-    met = db.execute(select(func.count(Outcome.id)).where(Outcome.status == "MET")).scalar() or 0
-    not_met = db.execute(select(func.count(Outcome.id)).where(Outcome.status == "NOT_MET")).scalar() or 0
-    pending = db.execute(select(func.count(Outcome.id)).where(Outcome.status == "PENDING")).scalar() or 0
-
-    # avg days to target (MET only)
-    oq = (
-        select(Outcome.signal_id, Outcome.target_met_at)
-        .where(and_(Outcome.status == "MET", Outcome.target_met_at.is_not(None)))
+    q = (
+        select(
+            total_signals_sq,
+            total_top_sq,
+            func.count(Outcome.id).filter(Outcome.status == "MET"),
+            func.count(Outcome.id).filter(Outcome.status == "NOT_MET"),
+            func.count(Outcome.id).filter(Outcome.status == "PENDING"),
+            func.avg(days_to_target).filter(and_(
+                Outcome.status == "MET",
+                Outcome.target_met_at.is_not(None),
+                Outcome.target_met_at >= Signal.created_at,
+            )),
+        )
+        .select_from(Outcome)
+        .outerjoin(Signal, Signal.id == Outcome.signal_id)
     )
-    rows = db.execute(oq).all()
-
-    ids = [r[0] for r in rows]
-    created_lookup: Dict[Any, datetime] = {}
-    if ids:
-        sq = select(Signal.id, Signal.created_at).where(Signal.id.in_(ids))
-        for sid, created_at in db.execute(sq).all():
-            created_lookup[str(sid)] = created_at
-
-    diffs_days: List[float] = []
-    for sig_id, met_at in rows:
-        created_at = created_lookup.get(str(sig_id))
-        if created_at and met_at:
-            dt = (met_at - created_at).total_seconds() / 86400.0
-            if dt >= 0:
-                diffs_days.append(dt)
-
-    avg_days_to_target = round(sum(diffs_days) / len(diffs_days), 3) if diffs_days else None
+    total_signals, total_top, met, not_met, pending, avg_days = db.execute(q).one()
+    total_signals, total_top = total_signals or 0, total_top or 0
+    met, not_met, pending = met or 0, not_met or 0, pending or 0
+
+    avg_days_to_target = round(float(avg_days), 3) if avg_days is not None else None
     win_rate = round(met / max(1, (met + not_met)) * 100, 2) if (met + not_met) else None
 
     return {
@@ -253,7 +432,7 @@ def stats_summary(db=Depends(get_db)):
 
 
 # ---------- Day filter (London date) ----------
-@app.get("/signals/day")
+@app.get("/signals/day", response_model=List[SignalOut])
 def signals_by_day(
     date: str = Query(..., description="London date, format YYYY-MM-DD"),
     only_top: bool = Query(True),
@@ -265,36 +444,30 @@ def signals_by_day(
         q = q.where(Signal.is_top_pick == True)  # noqa: E712
     q = q.order_by(desc(Signal.created_at)).limit(limit)
     rows = db.execute(q).scalars().all()
-    return [_serialize_signal(s, _latest_outcome(db, s.id)) for s in rows]
+    return _serialize_many(db, rows)
 
 
 # ---------- Successful signals ----------
-@app.get("/signals/success")
+@app.get("/signals/success", response_model=List[SignalOut])
 def successful_signals(
     days: int = Query(10, ge=1, le=120),
     limit: int = Query(200, ge=1, le=1000),
     db=Depends(get_db),
 ):
     since = datetime.now(timezone.utc) - timedelta(days=days)
-    oq = (
-        select(Outcome)
+    q = (
+        select(Signal, Outcome)
+        .join(Outcome, Outcome.signal_id == Signal.id)
         .where(and_(Outcome.status == "MET", Outcome.target_met_at.is_not(None), Outcome.target_met_at >= since))
         .order_by(desc(Outcome.target_met_at))
         .limit(limit)
     )
-    outs = db.execute(oq).scalars().all()
-
-    result = []
-    for o in outs:
-        s = db.get(Signal, o.signal_id)
-        if s:
-            result.append(_serialize_signal(s, o))
-    return result
+    return _serialize_pairs(db.execute(q).all())
 
 
 # ---------- Progress movers since signal ----------
-@app.get("/signals/progress")
-def top_progress(
+@app.get("/signals/progress", response_model=List[SignalProgressOut])
+async def top_progress(
     hours: int = Query(48, ge=1, le=240),
     limit: int = Query(30, ge=1, le=200),
     only_top: bool = Query(True),
@@ -307,29 +480,45 @@ def top_progress(
         q = q.where(Signal.is_top_pick == True)  # noqa: E712
     q = q.order_by(desc(Signal.created_at)).limit(limit * 3)  # oversample before sorting
 
-    rows = db.execute(q).scalars().all()
+    def _load():
+        rows = db.execute(q).scalars().all()
+        return rows, _latest_outcomes(db, [s.id for s in rows])
+
+    # Blocking DB calls run in a worker thread too, off the event loop
+    rows, outcomes = await asyncio.to_thread(_load)
+
+    # Fetch each distinct ticker once, concurrently (blocking HTTP runs in worker threads)
+    tickers = list(dict.fromkeys(s.ticker for s in rows))
+    dfs = await asyncio.gather(
+        *(asyncio.to_thread(get_ohlcv, t, days=5) for t in tickers),
+        return_exceptions=True,
+    )
+    ohlcv_by_ticker = dict(zip(tickers, dfs))
+
     out = []
     for s in rows:
         try:
-            df = get_ohlcv(s.ticker, days=5)
-            if df.empty:
+            df = ohlcv_by_ticker.get(s.ticker)
+            if isinstance(df, BaseException) or df is None or df.empty:
                 continue
             last = float(df["Close"].iloc[-1])
             base = float(s.price_at_signal or 0.0) or 1e-9
             chg_pct = (last - base) / base * 100.0
 
-            item = _serialize_signal(s, _latest_outcome(db, s.id))
-            item["progress"] = {"last_price": round(last, 4), "change_pct": round(chg_pct, 2)}
-            out.append(item)
+            item = _serialize_signal(s, outcomes.get(str(s.id)))
+            out.append(SignalProgressOut(
+                **dict(item),
+                progress=ProgressOut(last_price=round(last, 4), change_pct=round(chg_pct, 2)),
+            ))
         except Exception:
             continue
 
-    out.sort(key=lambda x: x.get("progress", {}).get("change_pct", -999), reverse=True)
+    out.sort(key=lambda x: x.progress.change_pct, reverse=True)
     return out[:limit]
 
 
 # ---------- search/history ----------
-@app.get("/signals/search")
+@app.get("/signals/search", response_model=List[SignalOut])
 def search_signals(
     ticker: str = Query(..., min_length=1),
     limit: int = Query(100, ge=1, le=2000),
@@ -341,36 +530,33 @@ def search_signals(
         q = q.where(Signal.is_top_pick == True)  # noqa
     q = q.order_by(desc(Signal.created_at)).limit(limit)
     rows = db.execute(q).scalars().all()
-    return [_serialize_signal(s, _latest_outcome(db, s.id)) for s in rows]
+    return _serialize_many(db, rows)
 
 
-@app.get("/signals/history")
+@app.get("/signals/history", response_model=List[SignalOut])
 def signal_history(
     ticker: str = Query(..., min_length=1),
     db=Depends(get_db)
 ):
     q = select(Signal).where(Signal.ticker == ticker).order_by(desc(Signal.created_at))
     rows = db.execute(q).scalars().all()
-    return [_serialize_signal(s, _latest_outcome(db, s.id)) for s in rows]
+    return _serialize_many(db, rows)
 
 
-@app.get("/outcomes/open")
+@app.get("/outcomes/open", response_model=List[SignalOut])
 def open_outcomes(db=Depends(get_db)):
-    oq = select(Outcome).where(Outcome.status == "PENDING")
-    open_rows = db.execute(oq).scalars().all()
-
-    result = []
-    for o in open_rows:
-        s = db.get(Signal, o.signal_id)
-        if not s:
-            continue
-        result.append(_serialize_signal(s, o))
-    result.sort(key=lambda r: r["created_at"] or "", reverse=True)
+    q = (
+        select(Signal, Outcome)
+        .join(Outcome, Outcome.signal_id == Signal.id)
+        .where(Outcome.status == "PENDING")
+    )
+    result = _serialize_pairs(db.execute(q).all())
+    result.sort(key=lambda r: r.created_at or "", reverse=True)
     return result
 
 
 # ---------- keep dynamic route LAST ----------
-@app.get("/signals/{signal_id}")
+@app.get("/signals/{signal_id}", response_model=SignalOut)
 def get_signal(signal_id: str, db=Depends(get_db)):
     s = db.get(Signal, signal_id)
     if not s:
@@ -379,19 +565,99 @@ def get_signal(signal_id: str, db=Depends(get_db)):
 
 
 # ---------- optional chart endpoint ----------
-@app.get("/charts/{ticker}_chart.html")
-def get_chart(ticker: str):
-    chart_path = os.path.join(CHARTS_DIR, f"{ticker}_chart.html")
+# Bounds concurrent chart builds (each one hits Polygon) across requests.
+_CHART_SEMAPHORE = asyncio.Semaphore(8)
+
+
+async def _build_chart(ticker: str) -> None:
+    name = f"{ticker}_chart.html"
+    path = os.path.join(CHARTS_DIR, name)
+    async with _CHART_SEMAPHORE:
+        saved = await asyncio.to_thread(generate_chart, ticker, save_path=path)
+    # generate_chart returns None (and writes nothing) when there's no data
+    if saved and os.path.exists(path):
+        _mark_chart(name)
+
 
-    if not os.path.exists(chart_path):
-        if generate_chart is None:
-            raise HTTPException(status_code=404, detail="Chart not found and generator unavailable.")
+class ChartFiles(StaticFiles):
+    """
+    Static chart files (served with sendfile where available), built on first
+    request when missing and stamped with a short public cache lifetime.
+    """
+
+    async def get_response(self, path: str, scope):
+        name = os.path.basename(path)
+        if name == path and name.endswith("_chart.html") and name not in _chart_names():
+            if generate_chart is None:
+                raise HTTPException(status_code=404, detail="Chart not found and generator unavailable.")
+            try:
+                await _build_chart(name[: -len("_chart.html")])
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to generate chart: {e}")
+
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=300"
+        return response
+
+
+# ---------- background chart warmer ----------
+CHART_WARM_INTERVAL = int(os.getenv("CHART_WARM_INTERVAL", "900"))  # seconds; 0 disables
+
+
+def _recent_tickers(limit: int = 200) -> List[str]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Signal.ticker).order_by(desc(Signal.created_at)).limit(limit)
+        ).scalars().all()
+    finally:
+        db.close()
+    return list(dict.fromkeys(t for t in rows if t))
+
+
+async def _chart_warmer() -> None:
+    """Pre-build charts for recently signalled tickers so the chart route is usually a plain file read."""
+    while True:
         try:
-            generate_chart(ticker, save_path=chart_path)
+            tickers = await asyncio.to_thread(_recent_tickers)
+            have = _chart_names()
+            missing = [t for t in tickers if f"{t}_chart.html" not in have]
+            if missing:
+                await asyncio.gather(*(_build_chart(t) for t in missing), return_exceptions=True)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to generate chart: {e}")
+            print(f"Chart warmer error: {e}")
+        await asyncio.sleep(CHART_WARM_INTERVAL)
 
-    return FileResponse(chart_path)
 
+@app.on_event("startup")
+async def _start_chart_warmer():
+    if generate_chart is not None and CHART_WARM_INTERVAL > 0:
+        app.state.chart_warmer = asyncio.create_task(_chart_warmer())
 
 
+@lru_cache(maxsize=256)
+def _spec_etag(spec: str) -> str:
+    # chart_json hands back the same cached str object, so this is a dict hit
+    return '"%s"' % hashlib.blake2b(spec.encode(), digest_size=16).hexdigest()
+
+
+@app.get("/charts/{ticker}_chart.json")
+def get_chart_json(ticker: str, request: Request):
+    """Plotly figure JSON for client-side rendering (much smaller than the HTML page)."""
+    if chart_json is None:
+        raise HTTPException(status_code=404, detail="Chart generator unavailable.")
+    try:
+        spec = chart_json(ticker)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate chart: {e}")
+    if spec is None:
+        raise HTTPException(status_code=404, detail="Chart data not found.")
+    headers = {"ETag": _spec_etag(spec), "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=spec, media_type="application/json", headers=headers)
+
+
+# Mounted last so the explicit /charts/*.json route above takes precedence.
+app.mount("/charts", ChartFiles(directory=CHARTS_DIR), name="charts")
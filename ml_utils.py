@@ -1,27 +1,130 @@
 # ml_utils.py
 
+from datetime import date
+from functools import lru_cache
+
 import joblib
+import numpy as np
+import pandas as pd
 import plotly.graph_objs as go
-from polygon_api import get_ohlcv
+from app.numba_utils import njit
+from app.polygon_api import get_ohlcv
 import os
 
+# Optional ONNX Runtime backend for the compiled model export (see train_model.py)
+try:
+    import onnxruntime as ort  # type: ignore
+    _HAS_ORT = True
+except Exception:
+    ort = None
+    _HAS_ORT = False
+
+
+class OnnxModel:
+    """`predict_proba`-compatible wrapper around an ONNX Runtime session."""
+
+    def __init__(self, path):
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_proba(self, X):
+        arr = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        _, proba = self.session.run(None, {self.input_name: arr})
+        return np.asarray(proba)
+
+
+@njit(cache=True, nogil=True)
+def _tree_proba(X, left, right, feature, threshold, leaf_proba):
+    out = np.empty((X.shape[0], leaf_proba.shape[1]))
+    for i in range(X.shape[0]):
+        node = 0
+        while left[node] != -1:
+            if X[i, feature[node]] <= threshold[node]:
+                node = left[node]
+            else:
+                node = right[node]
+        out[i] = leaf_proba[node]
+    return out
+
+
+class CompiledTree:
+    """
+    A fitted single-output DecisionTreeClassifier flattened into its node
+    arrays and evaluated by a JIT traversal kernel, without sklearn's
+    per-call input validation and dispatch. `train_model.py` writes the same
+    arrays to an `.npz`, which `load` reads back without importing sklearn.
+    """
+
+    def __init__(self, left, right, feature, threshold, leaf_proba, classes, feature_names=()):
+        self._left = np.ascontiguousarray(left, dtype=np.int64)
+        self._right = np.ascontiguousarray(right, dtype=np.int64)
+        self._feature = np.ascontiguousarray(feature, dtype=np.int64)
+        # thresholds stay float64: sklearn splits halfway between float32 values
+        self._threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self._leaf_proba = np.ascontiguousarray(leaf_proba, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.feature_names = [str(n) for n in feature_names]
+
+    @classmethod
+    def from_estimator(cls, est):
+        t = est.tree_
+        value = t.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        if not np.allclose(totals, 1.0):
+            value = value / totals  # older sklearn stores class counts, not fractions
+        return cls(t.children_left, t.children_right, t.feature, t.threshold, value,
+                   est.classes_, getattr(est, "feature_names_in_", ()))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            return cls(z["left"], z["right"], z["feature"], z["threshold"], z["leaf_proba"],
+                       z["classes"], z["feature_names"])
+
+    def predict_proba(self, X):
+        if isinstance(X, pd.DataFrame) and self.feature_names:
+            X = X[self.feature_names]
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        arr = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        return _tree_proba(arr, self._left, self._right, self._feature, self._threshold, self._leaf_proba)
+
+
+def _compile(model):
+    tree = getattr(model, "tree_", None)
+    if tree is not None and getattr(model, "n_outputs_", 2) == 1 and hasattr(model, "classes_"):
+        return CompiledTree.from_estimator(model)
+    return model
+
+
+def _fresh(path, model_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+@lru_cache(maxsize=1)
 def load_model(model_path="ml_stock_model.pkl"):
     """
     Loads the pre-trained machine learning model from a file.
+    The result is cached, so repeat calls don't re-read the pickle.
+    Up-to-date exports next to the pickle are preferred: `.onnx` when
+    onnxruntime is installed, then the `.npz` tree arrays (no sklearn import).
+    A pickled decision tree is otherwise compiled to a `CompiledTree`.
     """
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model file not found at {model_path}. Please train a model first and ensure it is in your GitHub repository.")
-    return joblib.load(model_path)
-
-def generate_chart(ticker, days=60, save_path=None):
-    """
-    Generates an interactive candlestick chart and saves it to a given path.
-    """
-    df = get_ohlcv(ticker, days=days)
-    if df.empty:
-        print(f"Could not retrieve chart data for {ticker}")
-        return None
+    stem = os.path.splitext(model_path)[0]
+    if _HAS_ORT and _fresh(stem + ".onnx", model_path):
+        try:
+            return OnnxModel(stem + ".onnx")
+        except Exception as e:
+            print(f"Could not load ONNX model, using pickle: {e}")
+    if _fresh(stem + ".npz", model_path):
+        try:
+            return CompiledTree.load(stem + ".npz")
+        except Exception as e:
+            print(f"Could not load tree arrays, using pickle: {e}")
+    return _compile(joblib.load(model_path))
 
+def _build_figure(ticker, days, df):
     fig = go.Figure(data=[go.Candlestick(
         x=df.index,
         open=df['Open'],
@@ -37,9 +140,42 @@ def generate_chart(ticker, days=60, save_path=None):
         yaxis_title='Price (USD)',
         xaxis_rangeslider_visible=False
     )
+    return fig
+
+def generate_chart(ticker, days=60, save_path=None):
+    """
+    Generates an interactive candlestick chart and saves it to a given path.
+    """
+    df = get_ohlcv(ticker, days=days)
+    if df.empty:
+        print(f"Could not retrieve chart data for {ticker}")
+        return None
+
+    fig = _build_figure(ticker, days, df)
 
     if save_path:
-        fig.write_html(save_path)
+        # plotly.js from the CDN instead of inlining the ~3 MB bundle per file
+        fig.write_html(save_path, include_plotlyjs="cdn", full_html=True, config={"displayModeBar": False})
         return save_path
 
-    return fig
\ No newline at end of file
+    return fig
+
+@lru_cache(maxsize=256)
+def _chart_json_cached(ticker, days, day_bucket):
+    # day_bucket is only part of the key, so entries roll over daily
+    df = get_ohlcv(ticker, days=days)
+    if df.empty:
+        raise LookupError(ticker)  # not cached; retried on the next request
+    return _build_figure(ticker, days, df).to_json()
+
+def chart_json(ticker, days=60):
+    """
+    Plotly figure spec (JSON string) for the candlestick chart, for rendering
+    client-side with plotly.js. Cached per ticker for the current day.
+    Returns None if no data is available.
+    """
+    try:
+        return _chart_json_cached(ticker.upper(), days, date.today().isoformat())
+    except LookupError:
+        print(f"Could not retrieve chart data for {ticker}")
+        return None
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Float, Integer, Date, create_engine
+from sqlalchemy import Column, String, Float, Integer, Date, create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -20,5 +21,33 @@ class Signal(Base):
     tags = Column(String)
     chart_url = Column(String)
 
-engine = create_engine(DATABASE_URL)
+# Pooled engine: reuse connections across requests, drop dead ones before use
+# and recycle before server-side idle timeouts. SQLite doesn't take pool sizing.
+_IS_SQLITE = (DATABASE_URL or "").startswith("sqlite")
+_POOL_KW = {} if _IS_SQLITE else dict(
+    pool_size=10, max_overflow=20, pool_pre_ping=True, pool_recycle=1800,
+)
+# psycopg2: batch executemany UPDATEs too, not just the multi-VALUES INSERTs
+if not _IS_SQLITE and DATABASE_URL and make_url(DATABASE_URL).get_driver_name() == "psycopg2":
+    _POOL_KW["executemany_mode"] = "values_plus_batch"
+engine = create_engine(DATABASE_URL, **_POOL_KW)
+
+if _IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers (the API) run alongside the scan's write, and
+        # synchronous=NORMAL drops the fsync on every commit.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def get_db():
+    """FastAPI dependency: one session per request, always closed."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
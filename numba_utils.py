@@ -0,0 +1,31 @@
+# app/numba_utils.py
+"""
+Optional Numba JIT support.
+
+`njit` behaves like `numba.njit` when numba is installed and degrades to a
+no-op decorator otherwise, so kernels stay importable (as plain Python) in
+environments without numba.
+"""
+
+try:
+    from numba import njit as _numba_njit  # type: ignore
+    HAS_NUMBA = True
+except Exception:
+    _numba_njit = None
+    HAS_NUMBA = False
+
+
+def njit(*args, **kwargs):
+    """Decorator: `numba.njit(*args, **kwargs)` if available, else identity."""
+    if HAS_NUMBA:
+        return _numba_njit(*args, **kwargs)
+
+    # Bare usage: @njit
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+
+    # Parameterized usage: @njit(cache=True)
+    def _decorator(fn):
+        return fn
+
+    return _decorator
@@ -1,13 +1,21 @@
 # ==============================
 # FILE: app/polygon_api.py
 # ==============================
+import asyncio
+import io
 import os
 import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List, Tuple
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Optional Redis cache (set REDIS_URL). Falls back to in-process cache.
@@ -18,26 +26,124 @@ except Exception:
     redis = None
     _HAS_REDIS = False
 
+# Optional async HTTP client for concurrent history fetches.
+try:
+    import httpx  # type: ignore
+    _HAS_HTTPX = True
+except Exception:
+    httpx = None
+    _HAS_HTTPX = False
+
+# HTTP/2 lets the async fan-out multiplex over a few connections (needs `h2`).
+try:
+    import h2  # type: ignore  # noqa: F401
+    _HAS_H2 = True
+except Exception:
+    _HAS_H2 = False
+
+# Optional Arrow/Feather encoding for cached DataFrames (keeps dtypes).
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    _HAS_ARROW = True
+except Exception:
+    _HAS_ARROW = False
+
+# Optional persistent cache so universe/metric results survive across scan
+# processes when Redis isn't configured.
+try:
+    import diskcache  # type: ignore
+    _HAS_DISKCACHE = True
+except Exception:
+    diskcache = None
+    _HAS_DISKCACHE = False
+
+# Optional faster JSON codec for Polygon payloads and Redis cache entries.
+try:
+    import orjson  # type: ignore
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except Exception:
+    orjson = None
+    _loads = json.loads
+    _dumps = json.dumps
+
+# US session clock (grouped-bar finality)
+try:
+    import zoneinfo
+    NEW_YORK = zoneinfo.ZoneInfo("America/New_York")
+except Exception:
+    from pytz import timezone as _tz
+    NEW_YORK = _tz("America/New_York")
+
 load_dotenv()
 
 API_KEY = os.getenv("POLYGON_API_KEY")
 BASE_URL = "https://api.polygon.io"
 REDIS_URL = os.getenv("REDIS_URL")
+CACHE_DIR = os.getenv("POLYGON_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".polygon_cache"))
+
+# ---- shared HTTP session: keep-alive connection pool + retries on 429/5xx
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+FETCH_WORKERS = 32  # threaded fetch fallback; matches the session pool size
 
 # ---- tiny on-disk cache: ticker -> name (company name lookup)
+# Snapshot JSON plus an append-only JSONL log of new entries; the log is folded
+# back into the snapshot once it outgrows it, so inserts don't rewrite the file.
 _CACHE_PATH = os.path.join(os.path.dirname(__file__), "ticker_name_cache.json")
+_CACHE_LOG_PATH = os.path.join(os.path.dirname(__file__), "ticker_name_cache.jsonl")
+_NAME_CACHE_LOCK = threading.Lock()
+_COMPACT_MIN_LINES = 256
+
 try:
     with open(_CACHE_PATH, "r", encoding="utf-8") as f:
         _NAME_CACHE: dict[str, str] = json.load(f)
 except Exception:
     _NAME_CACHE = {}
+_SNAPSHOT_SIZE = len(_NAME_CACHE)
 
-def _save_name_cache():
-    try:
-        with open(_CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(_NAME_CACHE, f)
-    except Exception:
-        pass
+_LOG_LINES = 0
+try:
+    with open(_CACHE_LOG_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                _NAME_CACHE.update(json.loads(line))
+                _LOG_LINES += 1
+            except ValueError:
+                continue  # torn last line from an interrupted write
+except OSError:
+    pass
+
+
+def _compact_name_cache():
+    # Caller holds _NAME_CACHE_LOCK: inserts take it too, so the dict can't
+    # change size mid-dump and no log line lands between dump and truncate.
+    global _LOG_LINES, _SNAPSHOT_SIZE
+    tmp = _CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_NAME_CACHE, f)
+    os.replace(tmp, _CACHE_PATH)
+    open(_CACHE_LOG_PATH, "w").close()
+    _LOG_LINES = 0
+    _SNAPSHOT_SIZE = len(_NAME_CACHE)
+
+
+def _save_name_cache(ticker: str, name: str):
+    global _LOG_LINES
+    with _NAME_CACHE_LOCK:
+        _NAME_CACHE[ticker] = name
+        try:
+            with open(_CACHE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps({ticker: name}) + "\n")
+            _LOG_LINES += 1
+            if _LOG_LINES > max(_COMPACT_MIN_LINES, _SNAPSHOT_SIZE):
+                _compact_name_cache()
+        except Exception:
+            pass
 
 # ---- lightweight in-process cache for universe + metrics ----
 _MEMO: Dict[str, Any] = {}
@@ -59,15 +165,48 @@ def _redis_client():
     return None
 
 
+_DISK = None
+
+
+def _disk_cache():
+    global _DISK
+    if _DISK is None and _HAS_DISKCACHE:
+        try:
+            _DISK = diskcache.Cache(CACHE_DIR)
+        except Exception:
+            return None
+    return _DISK
+
+
+def _disk_set(key: str, value: Any, ttl_seconds: int) -> None:
+    d = _disk_cache()
+    if d is not None:
+        try:
+            d.set(key, value, expire=ttl_seconds)
+        except Exception:
+            pass
+
+
+def _disk_get(key: str) -> Optional[Any]:
+    d = _disk_cache()
+    if d is not None:
+        try:
+            return d.get(key)
+        except Exception:
+            pass
+    return None
+
+
 def _cache_set(key: str, payload: Any, ttl_seconds: int = 600) -> None:
     r = _redis_client()
     if r is not None:
         try:
-            r.setex(key, ttl_seconds, json.dumps(payload))
+            r.setex(key, ttl_seconds, _dumps(payload))
             return
         except Exception:
             pass
     _MEMO[key] = payload
+    _disk_set(key, payload, ttl_seconds)
 
 
 def _cache_get(key: str) -> Optional[Any]:
@@ -76,10 +215,49 @@ def _cache_get(key: str) -> Optional[Any]:
         try:
             v = r.get(key)
             if v:
-                return json.loads(v)
+                return _loads(v)
         except Exception:
             pass
-    return _MEMO.get(key)
+    if key in _MEMO:
+        return _MEMO[key]
+    return _disk_get(key)
+
+
+def _cache_set_frame(key: str, df: pd.DataFrame, ttl_seconds: int = 600) -> None:
+    """Cache a DataFrame: Feather bytes in Redis (JSON records without pyarrow), the frame itself in-process."""
+    r = _redis_client()
+    if r is not None:
+        try:
+            if _HAS_ARROW:
+                buf = io.BytesIO()
+                df.reset_index(drop=True).to_feather(buf)
+                blob = buf.getvalue()
+            else:
+                blob = df.to_json(orient="records")
+            r.setex(key, ttl_seconds, blob)
+            return
+        except Exception:
+            pass
+    _MEMO[key] = (time.monotonic() + ttl_seconds, df.copy())
+    _disk_set(key, df, ttl_seconds)
+
+
+def _cache_get_frame(key: str) -> Optional[pd.DataFrame]:
+    r = _redis_client()
+    if r is not None:
+        try:
+            v = r.get(key)
+            if v:
+                if v[:6] == b"ARROW1":
+                    return pd.read_feather(io.BytesIO(v))
+                return pd.DataFrame(_loads(v))
+        except Exception:
+            pass
+    hit = _MEMO.get(key)
+    if isinstance(hit, tuple) and hit[0] > time.monotonic():
+        return hit[1].copy()
+    df = _disk_get(key)
+    return df if isinstance(df, pd.DataFrame) else None
 
 
 # --------------------
@@ -93,26 +271,43 @@ def _get_reference_page(cursor: Optional[str] = None, limit: int = 1000) -> Dict
     url = f"{BASE_URL}/v3/reference/tickers"
     if cursor:
         params["cursor"] = cursor
-    resp = requests.get(url, params=params, timeout=20)
+    resp = _SESSION.get(url, params=params, timeout=20)
     resp.raise_for_status()
-    return resp.json() or {}
+    return _loads(resp.content) or {}
+
+
+def _next_cursor(data: Dict[str, Any]) -> Optional[str]:
+    cursor_url = data.get("next_url")
+    if not cursor_url:
+        return None
+    # Polygon v3 uses next_url; extract cursor token if present
+    try:
+        return cursor_url.split("cursor=")[-1]
+    except Exception:
+        return None
+
+
+def _iter_reference_pages(max_pages: int = 10):
+    """
+    Yield reference ticker pages in order. The next page is requested in the
+    background while the caller processes the current one; pages themselves
+    are still fetched one after another (each cursor comes from the previous page).
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fut = pool.submit(_get_reference_page, None)
+        for i in range(max_pages):
+            data = fut.result()
+            cursor = _next_cursor(data) if i + 1 < max_pages else None
+            fut = pool.submit(_get_reference_page, cursor) if cursor else None
+            yield data.get("results", [])
+            if fut is None:
+                break
 
 
 def _get_all_reference_tickers(max_pages: int = 10) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
-    cursor = None
-    for _ in range(max_pages):
-        data = _get_reference_page(cursor=cursor)
-        results = data.get("results", [])
+    for results in _iter_reference_pages(max_pages):
         out.extend(results)
-        cursor_url = data.get("next_url")
-        if not cursor_url:
-            break
-        # Polygon v3 uses next_url; extract cursor token if present
-        try:
-            cursor = cursor_url.split("cursor=")[-1]
-        except Exception:
-            cursor = None
     return out
 
 
@@ -123,33 +318,129 @@ def _get_all_reference_tickers(max_pages: int = 10) -> List[Dict[str, Any]]:
 def get_grouped_for(date_str: str) -> List[Dict[str, Any]]:
     url = f"{BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/{date_str}"
     params = _auth_params({"adjusted": "true"})
-    resp = requests.get(url, params=params, timeout=30)
+    resp = _SESSION.get(url, params=params, timeout=30)
     resp.raise_for_status()
-    return resp.json().get("results", [])
+    return _loads(resp.content).get("results", [])
+
+
+_GROUPED_COLS = ["date", "T", "t", "o", "h", "l", "c", "v"]
+# Finished sessions never change, so their grouped frames are kept per date:
+# in-process (LRU-bounded) and in the disk tier across restarts. A session
+# counts as finished once US/Eastern time is past its post-market close (20:00)
+# plus a publish lag, whatever the host's timezone; until then it is refetched.
+GROUPED_PUBLISH_LAG_HOURS = float(os.getenv("GROUPED_PUBLISH_LAG_HOURS", "2"))
+_GROUPED_MEMO: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_GROUPED_MEMO_MAX = 128
+_GROUPED_LOCK = threading.Lock()
+
+
+def _remember_grouped(day_str: str, df: pd.DataFrame) -> None:
+    # LRU: the least recently used date is evicted first
+    with _GROUPED_LOCK:
+        _GROUPED_MEMO[day_str] = df
+        _GROUPED_MEMO.move_to_end(day_str)
+        while len(_GROUPED_MEMO) > _GROUPED_MEMO_MAX:
+            _GROUPED_MEMO.popitem(last=False)
+
+
+def _session_final(day_str: str) -> bool:
+    # Compared as naive US/Eastern wall-clock times (works for zoneinfo and pytz)
+    now_et = datetime.now(NEW_YORK).replace(tzinfo=None)
+    return now_et >= datetime.fromisoformat(day_str) + timedelta(hours=20 + GROUPED_PUBLISH_LAG_HOURS)
+
+
+def _grouped_day_frame(day_str: str) -> pd.DataFrame:
+    final = _session_final(day_str)
+    if final:
+        with _GROUPED_LOCK:
+            hit = _GROUPED_MEMO.get(day_str)
+            if hit is not None:
+                _GROUPED_MEMO.move_to_end(day_str)
+                return hit
+        hit = _disk_get(f"grouped:{day_str}")
+        if isinstance(hit, pd.DataFrame):
+            _remember_grouped(day_str, hit)
+            return hit
+
+    # Errors propagate: a missing session would silently open a gap in every
+    # ticker's history. Only a 200 with no results (a holiday) comes back empty.
+    rows = get_grouped_for(day_str)
+    df = pd.DataFrame(rows, columns=_GROUPED_COLS[1:])
+    df.insert(0, "date", day_str)
+
+    # empty results may just mean the session isn't published yet
+    if final and not df.empty:
+        _remember_grouped(day_str, df)
+        _disk_set(f"grouped:{day_str}", df, 30 * 24 * 3600)
+    return df
+
+
+def get_grouped_ohlcv_range(start: datetime, end: datetime, max_workers: int = 8) -> pd.DataFrame:
+    """
+    Grouped daily bars for every weekday in [start, end], one request per day
+    (fetched in parallel) regardless of how many tickers are needed.
+    Past days are served from the per-date cache after their first fetch.
+    Raises if any day's request fails, so callers never see a range with a
+    session silently missing. Columns: date, T, t, o, h, l, c, v.
+    """
+    days = []
+    d = start.date()
+    while d <= end.date():
+        if d.weekday() < 5:
+            days.append(d.isoformat())
+        d += timedelta(days=1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = [f for f in pool.map(_grouped_day_frame, days) if not f.empty]
+
+    if not frames:
+        return pd.DataFrame(columns=_GROUPED_COLS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def split_grouped_by_ticker(big_df: pd.DataFrame, tickers: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """Pivot a grouped range into per-ticker frames shaped like `get_ohlcv` output."""
+    if big_df.empty:
+        return {}
+    if tickers is not None:
+        big_df = big_df[big_df["T"].isin(tickers)]
+    big_df = big_df.sort_values("t").rename(
+        columns={"o": "Open", "h": "High", "l": "Low", "c": "Close", "v": "Volume"}
+    )
+    big_df.index = pd.to_datetime(big_df["t"], unit="ms").rename("t")
+    cols = ["Open", "High", "Low", "Close", "Volume"]
+    return {t: g[cols] for t, g in big_df.groupby("T", sort=False)}
 
 
 def last_trade_day_str(today: Optional[datetime] = None) -> str:
     base = today or datetime.now()
     for i in range(1, 10):
-        day_str = (base - timedelta(days=i)).strftime("%Y-%m-%d")
+        day_str = (base - timedelta(days=i)).date().isoformat()
         results = get_grouped_for(day_str)
         if results:
             return day_str
-    return (base - timedelta(days=1)).strftime("%Y-%m-%d")
+    return (base - timedelta(days=1)).date().isoformat()
 
 
 # --------------------
 # OHLCV (daily & intraday)
 # --------------------
 
-def get_ohlcv(ticker: str, days: int = 90) -> pd.DataFrame:
+def _ohlcv_request(ticker: str, days: int, start: Optional[datetime] = None) -> Tuple[str, Dict[str, Any]]:
     end = datetime.now()
-    start = end - timedelta(days=days)
-    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start.strftime('%Y-%m-%d')}/{end.strftime('%Y-%m-%d')}"
-    params = _auth_params({"adjusted": "true", "sort": "asc", "limit": days})
-    resp = requests.get(url, params=params, timeout=20)
-    resp.raise_for_status()
-    data = resp.json().get("results", [])
+    start = start or end - timedelta(days=days)
+    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start.date().isoformat()}/{end.date().isoformat()}"
+    return url, _auth_params({"adjusted": "true", "sort": "asc", "limit": days})
+
+
+def _intraday_request(ticker: str, multiplier: int, timespan: str, lookback_days: int) -> Tuple[str, Dict[str, Any]]:
+    end = datetime.now()
+    start = end - timedelta(days=lookback_days)
+    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start.date().isoformat()}/{end.date().isoformat()}"
+    return url, _auth_params({"adjusted": "true", "sort": "asc", "limit": 50000})
+
+
+def _bars_to_frame(data: List[Dict[str, Any]]) -> pd.DataFrame:
     if not data:
         return pd.DataFrame()
     df = pd.DataFrame(data)
@@ -159,23 +450,213 @@ def get_ohlcv(ticker: str, days: int = 90) -> pd.DataFrame:
     return df[["Open", "High", "Low", "Close", "Volume"]]
 
 
+# Per-ticker Parquet history of completed sessions: repeat fetches only request
+# bars from the last cached day onward, and that day is the validation anchor.
+# A changed anchor bar (e.g. split adjustment) forces a full reload. Today's
+# forming bar is returned but never stored, so it can't become the anchor.
+_OHLCV_DIR = os.path.join(CACHE_DIR, "ohlcv")
+_OHLCV_KEEP_DAYS = 400
+
+
+def _fetch_daily(ticker: str, days: int, start: Optional[datetime] = None) -> pd.DataFrame:
+    url, params = _ohlcv_request(ticker, days, start)
+    resp = _SESSION.get(url, params=params, timeout=20)
+    resp.raise_for_status()
+    return _bars_to_frame(_loads(resp.content).get("results", []))
+
+
+def _get_ohlcv_incremental(ticker: str, days: int) -> pd.DataFrame:
+    path = os.path.join(_OHLCV_DIR, f"{ticker}.parquet")
+    now = datetime.now()
+    start = now - timedelta(days=days)
+
+    cached = None
+    try:
+        cached = pd.read_parquet(path)
+    except Exception:
+        pass
+
+    df = None
+    # weekends/holidays mean the first bar can land a few days after `start`
+    if cached is not None and not cached.empty and cached.index[0] <= start + timedelta(days=5):
+        last = cached.index[-1]
+        delta = _fetch_daily(ticker, days, start=last.to_pydatetime())
+        if delta.empty or (last in delta.index and delta.at[last, "Close"] == cached.at[last, "Close"]):
+            df = pd.concat([cached[cached.index < last], delta]) if not delta.empty else cached
+    if df is None:
+        df = _fetch_daily(ticker, days)
+
+    completed = df[(df.index < pd.Timestamp(now.date())) & (df.index >= now - timedelta(days=_OHLCV_KEEP_DAYS))]
+    if not completed.empty and (cached is None or not completed.equals(cached)):
+        try:
+            os.makedirs(_OHLCV_DIR, exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            completed.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception:
+            pass
+    return df[df.index >= pd.Timestamp(start.date())]
+
+
+# Completed sessions never change, so get_ohlcv memoizes the history before
+# today per (ticker, days, date): a bounded in-process LRU, backed by the Parquet
+# history (or the disk tier without pyarrow) for reuse across restarts. Today's
+# bar keeps moving during the session and is only reused for OHLCV_LIVE_TTL.
+_OHLCV_MEMO: "OrderedDict[Tuple[str, int, str], pd.DataFrame]" = OrderedDict()
+_OHLCV_MEMO_MAX = 2048
+_OHLCV_LIVE: "OrderedDict[Tuple[str, str], Tuple[float, pd.DataFrame]]" = OrderedDict()
+OHLCV_LIVE_TTL = int(os.getenv("OHLCV_LIVE_TTL", "120"))  # seconds
+_OHLCV_LOCK = threading.Lock()
+
+
+def _split_today(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(completed sessions, today's still-forming bar) of a daily frame."""
+    today = pd.Timestamp(datetime.now().date())
+    return df[df.index < today], df[df.index >= today]
+
+
+def _put_live(key: Tuple[str, str], live: pd.DataFrame) -> None:
+    with _OHLCV_LOCK:
+        _OHLCV_LIVE[key] = (time.monotonic() + OHLCV_LIVE_TTL, live)
+        _OHLCV_LIVE.move_to_end(key)
+        while len(_OHLCV_LIVE) > _OHLCV_MEMO_MAX:
+            _OHLCV_LIVE.popitem(last=False)
+
+
+def _today_bar(ticker: str, day: str) -> pd.DataFrame:
+    key = (ticker, day)
+    with _OHLCV_LOCK:
+        hit = _OHLCV_LIVE.get(key)
+    if hit is not None and hit[0] > time.monotonic():
+        return hit[1]
+    _, live = _split_today(_fetch_daily(ticker, 1, start=datetime.fromisoformat(day)))
+    _put_live(key, live)
+    return live
+
+
+def _load_history(ticker: str, days: int, day: str) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """Completed sessions for the window, plus today's bar when the fetch returned it."""
+    if _HAS_ARROW:
+        return _split_today(_get_ohlcv_incremental(ticker, days))
+    disk_key = f"ohlcv:{ticker}:{days}:{day}"
+    hist = _disk_get(disk_key)
+    if isinstance(hist, pd.DataFrame):
+        return hist, None
+    hist, live = _split_today(_fetch_daily(ticker, days))
+    if not hist.empty:
+        _disk_set(disk_key, hist, 24 * 3600)
+    return hist, live
+
+
+def get_ohlcv(ticker: str, days: int = 90) -> pd.DataFrame:
+    day = datetime.now().date().isoformat()
+    key = (ticker, days, day)
+    with _OHLCV_LOCK:
+        hist = _OHLCV_MEMO.get(key)
+        if hist is not None:
+            _OHLCV_MEMO.move_to_end(key)
+
+    if hist is None:
+        hist, live = _load_history(ticker, days, day)
+        if live is not None:
+            _put_live((ticker, day), live)  # fresh from the same request
+        if not hist.empty:
+            with _OHLCV_LOCK:
+                _OHLCV_MEMO[key] = hist
+                while len(_OHLCV_MEMO) > _OHLCV_MEMO_MAX:
+                    _OHLCV_MEMO.popitem(last=False)
+
+    live = _today_bar(ticker, day)
+    if live.empty:
+        return hist.copy()
+    return pd.concat([hist, live])
+
+
 def get_ohlcv_intraday(ticker: str, multiplier: int = 15, timespan: str = "minute", lookback_days: int = 5) -> pd.DataFrame:
     if not API_KEY:
         raise ValueError("POLYGON_API_KEY not found. Set it in your environment.")
-    end = datetime.now()
-    start = end - timedelta(days=lookback_days)
-    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start.strftime('%Y-%m-%d')}/{end.strftime('%Y-%m-%d')}"
-    params = _auth_params({"adjusted": "true", "sort": "asc", "limit": 50000})
-    resp = requests.get(url, params=params, timeout=30)
+    url, params = _intraday_request(ticker, multiplier, timespan, lookback_days)
+    resp = _SESSION.get(url, params=params, timeout=30)
     resp.raise_for_status()
-    data = resp.json().get("results", [])
-    if not data:
-        return pd.DataFrame()
-    df = pd.DataFrame(data)
-    df["t"] = pd.to_datetime(df["t"], unit="ms")
-    df.set_index("t", inplace=True)
-    df.rename(columns={"o": "Open", "h": "High", "l": "Low", "c": "Close", "v": "Volume"}, inplace=True)
-    return df[["Open", "High", "Low", "Close", "Volume"]]
+    return _bars_to_frame(_loads(resp.content).get("results", []))
+
+
+async def _get_results_async(
+    client, url: str, params: Dict[str, Any], retries: int = 3, timeout: float = 30
+) -> List[Dict[str, Any]]:
+    """GET an aggregates URL, backing off on 429 (honouring Retry-After when sent)."""
+    for attempt in range(retries + 1):
+        resp = await client.get(url, params=params, timeout=timeout)
+        if resp.status_code == 429 and attempt < retries:
+            try:
+                wait = float(resp.headers.get("Retry-After", ""))
+            except ValueError:
+                wait = 0.5 * (2 ** attempt)
+            await asyncio.sleep(wait)
+            continue
+        resp.raise_for_status()
+        return _loads(resp.content).get("results", [])
+    return []
+
+
+async def fetch_many_ohlcv_async(
+    tickers: List[str],
+    days: int = 90,
+    intraday: bool = False,
+    multiplier: int = 15,
+    timespan: str = "minute",
+    lookback_days: int = 5,
+    concurrency: int = 64,
+) -> Dict[str, Any]:
+    """
+    Fetch bars for many tickers concurrently on one httpx client.
+    Returns ticker -> DataFrame, or ticker -> Exception for failed fetches.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, http2=_HAS_H2) as client:
+        async def one(t: str):
+            if intraday:
+                url, params = _intraday_request(t, multiplier, timespan, lookback_days)
+            else:
+                url, params = _ohlcv_request(t, days)
+            async with sem:
+                return _bars_to_frame(await _get_results_async(client, url, params))
+
+        results = await asyncio.gather(*(one(t) for t in tickers), return_exceptions=True)
+    return dict(zip(tickers, results))
+
+
+def fetch_many_ohlcv(tickers: List[str], **kwargs) -> Dict[str, Any]:
+    """
+    Sync entry point for `fetch_many_ohlcv_async`. Falls back to the per-ticker
+    getters on a thread pool when httpx is missing or an event loop is already running.
+    """
+    if not API_KEY:
+        raise ValueError("POLYGON_API_KEY not found. Set it in your environment.")
+    if _HAS_HTTPX:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(fetch_many_ohlcv_async(tickers, **kwargs))
+
+    def one(t: str) -> Any:
+        try:
+            if kwargs.get("intraday"):
+                return get_ohlcv_intraday(
+                    t,
+                    multiplier=kwargs.get("multiplier", 15),
+                    timespan=kwargs.get("timespan", "minute"),
+                    lookback_days=kwargs.get("lookback_days", 5),
+                )
+            return get_ohlcv(t, days=kwargs.get("days", 90))
+        except Exception as e:
+            return e
+
+    # I/O-bound: overlap the round-trips on threads sized to the session's pool
+    with ThreadPoolExecutor(max_workers=kwargs.get("concurrency", FETCH_WORKERS)) as pool:
+        return dict(zip(tickers, pool.map(one, tickers)))
 
 
 # --------------------
@@ -194,16 +675,15 @@ def get_company_name(ticker: str) -> Optional[str]:
     url = f"{BASE_URL}/v3/reference/tickers/{t}"
     params = _auth_params()
     try:
-        resp = requests.get(url, params=params, timeout=10)
+        resp = _SESSION.get(url, params=params, timeout=10)
         resp.raise_for_status()
-        data = resp.json() or {}
+        data = _loads(resp.content) or {}
         result = data.get("results") or {}
         name = result.get("name")
         if name:
-            _NAME_CACHE[t] = name
-            _save_name_cache()
+            _save_name_cache(t, name)
             return name
-    except requests.RequestException:
+    except (requests.RequestException, ValueError):
         pass
     return None
 
@@ -215,26 +695,64 @@ get_ticker_name = get_company_name
 # Patch 3: True Relative Volume & True Gap helpers
 # --------------------
 
-def _avg_volume_30d_for_ticker(ticker: str, days: int = 45) -> Optional[float]:
-    """Fetch last ~45 sessions and compute avg Volume over last 30 sessions."""
+def _avg_volume_request(ticker: str, days: int) -> Tuple[str, Dict[str, Any]]:
     end = datetime.now()
     start = end - timedelta(days=days)
-    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start.strftime('%Y-%m-%d')}/{end.strftime('%Y-%m-%d')}"
-    params = _auth_params({"adjusted": "true", "sort": "desc", "limit": days})
+    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start.date().isoformat()}/{end.date().isoformat()}"
+    return url, _auth_params({"adjusted": "true", "sort": "desc", "limit": days})
+
+
+def _avg_volume_from_results(res: List[Dict[str, Any]]) -> Optional[float]:
+    if not res:
+        return None
+    vols = [row.get("v", 0) for row in res[:30] if row.get("v")]
+    if not vols:
+        return None
+    return float(sum(vols)) / float(len(vols))
+
+
+def _avg_volume_30d_for_ticker(ticker: str, days: int = 45) -> Optional[float]:
+    """Fetch last ~45 sessions and compute avg Volume over last 30 sessions."""
+    url, params = _avg_volume_request(ticker, days)
     try:
-        r = requests.get(url, params=params, timeout=20)
+        r = _SESSION.get(url, params=params, timeout=20)
         r.raise_for_status()
-        res = r.json().get("results", [])
-        if not res:
-            return None
-        vols = [row.get("v", 0) for row in res[:30] if row.get("v")]
-        if not vols:
-            return None
-        return float(sum(vols)) / float(len(vols))
-    except requests.RequestException:
+        return _avg_volume_from_results(_loads(r.content).get("results", []))
+    except (requests.RequestException, ValueError):
+        return None
+
+
+async def _avg_volume_30d_async(client, ticker: str, days: int = 45) -> Optional[float]:
+    """Async variant of `_avg_volume_30d_for_ticker` on a shared httpx client."""
+    url, params = _avg_volume_request(ticker, days)
+    try:
+        return _avg_volume_from_results(await _get_results_async(client, url, params, timeout=20))
+    except (httpx.HTTPError, ValueError):
         return None
 
 
+async def _avg_volumes_async(tickers: List[str], concurrency: int = 16) -> Dict[str, Optional[float]]:
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(http2=_HAS_H2) as client:
+        async def one(t: str):
+            async with sem:
+                return t, await _avg_volume_30d_async(client, t)
+
+        results = await asyncio.gather(*(one(t) for t in tickers))
+    return dict(results)
+
+
+def _fetch_avg_volumes(tickers: List[str]) -> Dict[str, Optional[float]]:
+    """Concurrent fetch when httpx is available and no loop is running; serial otherwise."""
+    if _HAS_HTTPX:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(_avg_volumes_async(tickers))
+    return {t: _avg_volume_30d_for_ticker(t) for t in tickers}
+
+
 def _prev_close_map(date_str: Optional[str] = None) -> Dict[str, float]:
     day = date_str or last_trade_day_str()
     cache_key = f"prevclose:{day}"
@@ -247,15 +765,14 @@ def _prev_close_map(date_str: Optional[str] = None) -> Dict[str, float]:
     results = get_grouped_for(day)
     if not results:
         return {}
-    df = pd.DataFrame(results).rename(columns={"T": "ticker", "c": "close"})
-    payload = json.loads(df[["ticker", "close"]].to_json(orient="records"))
+    payload = [{"ticker": r["T"], "close": float(r["c"])} for r in results if "T" in r and "c" in r]
     _cache_set(cache_key, payload, ttl_seconds=6 * 3600)
-    return {row["ticker"]: float(row["close"]) for row in payload}
+    return {row["ticker"]: row["close"] for row in payload}
 
 
 def _avg_vol_map(tickers: List[str], day_tag: Optional[str] = None, max_tickers: int = 1500) -> Dict[str, float]:
     """Compute/Cache avg_volume_30d for up to max_tickers; returns ticker->avgVol."""
-    day = day_tag or datetime.now().strftime("%Y-%m-%d")
+    day = day_tag or datetime.now().date().isoformat()
     base_key = f"avgvol30:{day}"
     existing = _cache_get(base_key) or {}
 
@@ -267,9 +784,9 @@ def _avg_vol_map(tickers: List[str], day_tag: Optional[str] = None, max_tickers:
         else:
             to_fetch.append(t)
 
-    # Fetch missing tickers one by one (Polygon rate limits apply). Consider batching or background job in prod.
-    for t in to_fetch:
-        avgv = _avg_volume_30d_for_ticker(t)
+    # Fetch missing tickers in bounded concurrent batches (Polygon rate limits apply).
+    fetched = _fetch_avg_volumes(to_fetch) if to_fetch else {}
+    for t, avgv in fetched.items():
         if avgv is not None:
             out[t] = avgv
             existing[t] = avgv
@@ -284,7 +801,7 @@ def _avg_vol_map(tickers: List[str], day_tag: Optional[str] = None, max_tickers:
 # --------------------
 
 def _today_str() -> str:
-    return datetime.now().strftime("%Y-%m-%d")
+    return datetime.now().date().isoformat()
 
 
 def get_diversified_universe(
@@ -307,34 +824,32 @@ def get_diversified_universe(
 
     day = _today_str()
     cache_key = f"universe:{day}:{int(use_history)}"
-    cached = _cache_get(cache_key)
+    cached = _cache_get_frame(cache_key)
     if cached is not None:
-        try:
-            return pd.read_json(pd.io.json.dumps(cached))
-        except Exception:
-            pass
+        return cached
 
     # 1) Reference metadata (ETF exclusion, market cap, sector)
-    meta = _get_all_reference_tickers(max_pages=10)
+    # Filter each page while the next one is in flight
     rows = []
-    for r in meta:
-        t = r.get("ticker")
-        if not t:
-            continue
-        ttype = (r.get("type") or "").upper()
-        if "ETF" in ttype:
-            continue
-        mcap = r.get("market_cap") or 0
-        if not mcap or mcap < min_mktcap:
-            continue
-        exch = (r.get("primary_exchange") or "").upper()
-        if "OTC" in exch:
-            continue
-        rows.append({
-            "ticker": t,
-            "sector": r.get("sic_sector") or r.get("sector") or "Unknown",
-            "market_cap": float(mcap),
-        })
+    for page in _iter_reference_pages(max_pages=10):
+        for r in page:
+            t = r.get("ticker")
+            if not t:
+                continue
+            ttype = (r.get("type") or "").upper()
+            if "ETF" in ttype:
+                continue
+            mcap = r.get("market_cap") or 0
+            if not mcap or mcap < min_mktcap:
+                continue
+            exch = (r.get("primary_exchange") or "").upper()
+            if "OTC" in exch:
+                continue
+            rows.append({
+                "ticker": t,
+                "sector": r.get("sic_sector") or r.get("sector") or "Unknown",
+                "market_cap": float(mcap),
+            })
     if not rows:
         return pd.DataFrame()
 
@@ -352,7 +867,8 @@ def get_diversified_universe(
 
     # Merge
     uni = ref_df.merge(gdf, on="ticker", how="inner")
-    uni["sector"] = uni["sector"].fillna("Unknown")
+    # category: a few dozen sectors across thousands of rows; cheaper groupbys
+    uni["sector"] = uni["sector"].fillna("Unknown").astype("category")
 
     # 3) History-backed metrics
     if use_history and not uni.empty:
@@ -362,9 +878,16 @@ def get_diversified_universe(
         uni["gap_abs"] = (uni["open"] - uni["prev_close"]).abs() / uni["prev_close"].replace(0, pd.NA)
 
         # Avg vol 30d (true rel-vol) for top names only to cap API usage
-        # Choose candidates by raw volume to focus on active names
-        vol_sorted = uni.sort_values("volume", ascending=False).head(history_limit)
-        avg_map = _avg_vol_map(vol_sorted["ticker"].tolist())
+        # Choose candidates by raw volume to focus on active names, with a
+        # preliminary per-sector cap. The final cap below also keeps each
+        # sector's top names by volume, so a name past 2x sector_cap is only
+        # missed when over half of the ones ahead of it fail the avg-vol floor.
+        vol_sorted = (
+            uni.sort_values("volume", ascending=False)
+            .groupby("sector", observed=True).head(sector_cap * 2)
+            .head(history_limit)
+        )
+        avg_map = _avg_vol_map(vol_sorted["ticker"].tolist(), day_tag=day)
         uni["avg_vol_30d"] = uni["ticker"].map(avg_map)
         uni["rel_vol"] = uni["volume"] / uni["avg_vol_30d"].replace(0, pd.NA)
     else:
@@ -379,8 +902,13 @@ def get_diversified_universe(
     if "avg_vol_30d" in uni.columns:
         uni = uni[(uni["avg_vol_30d"].fillna(0) >= avg_vol_30d_floor)]
 
-    # Early per-sector cap to avoid domination
-    uni = uni.groupby("sector").head(sector_cap).reset_index(drop=True)
+    # Early per-sector cap to avoid domination (most active names first,
+    # matching the candidate pre-cap above)
+    uni = (
+        uni.sort_values("volume", ascending=False)
+        .groupby("sector", observed=True).head(sector_cap)
+        .reset_index(drop=True)
+    )
 
     # 4) Composite score (tunable). Favor movers & rel-vol, then gap.
     w_move, w_relvol, w_gap = 0.55, 0.35, 0.10
@@ -390,12 +918,8 @@ def get_diversified_universe(
         w_gap  * uni["gap_abs"].fillna(0).clip(lower=0)
     )
 
-    uni["sector_rank"] = uni.groupby("sector")["score"].rank(ascending=False, method="first")
-
-    try:
-        payload = json.loads(uni.to_json(orient="records"))
-        _cache_set(cache_key, payload, ttl_seconds=cache_minutes * 60)
-    except Exception:
-        pass
+    uni["sector_rank"] = uni.groupby("sector", observed=True)["score"].rank(ascending=False, method="first")
 
-    return uni.sort_values(["sector", "sector_rank", "score"], ascending=[True, True, False]).reset_index(drop=True)
+    uni = uni.sort_values(["sector", "sector_rank", "score"], ascending=[True, True, False]).reset_index(drop=True)
+    _cache_set_frame(cache_key, uni, ttl_seconds=cache_minutes * 60)
+    return uni
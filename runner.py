@@ -0,0 +1,67 @@
+# app/runner.py
+"""
+Long-lived scan scheduler.
+
+Runs `run_scan` on a fixed interval inside one process so the loaded model,
+warmed JIT kernels, pooled HTTP sessions, caches and streaming indicator
+state stay in memory between cycles instead of being rebuilt on each start.
+
+    python -m app.runner
+
+With APScheduler installed, the interval job runs on a BlockingScheduler
+with `max_instances=1, coalesce=True`: a cycle that overruns the interval
+delays the next tick instead of overlapping it. Otherwise an asyncio loop
+with the same semantics is used.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from app.scan import MODEL_FILE, run_scan
+from app.ml_utils import load_model
+
+# Optional in-process scheduler
+try:
+    from apscheduler.schedulers.blocking import BlockingScheduler  # type: ignore
+    _HAS_APSCHEDULER = True
+except Exception:
+    BlockingScheduler = None
+    _HAS_APSCHEDULER = False
+
+SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", "1800"))  # seconds between cycle starts
+
+# Load (and compile) the model once for the life of the process
+MODEL = load_model(MODEL_FILE) if os.path.exists(MODEL_FILE) else None
+
+
+async def main(interval: int = SCAN_INTERVAL):
+    while True:
+        started = time.monotonic()
+        try:
+            # run_scan is blocking (requests/numpy/SQLAlchemy); keep the loop responsive
+            await asyncio.to_thread(run_scan, MODEL)
+        except Exception as e:
+            print(f"Scan cycle failed: {e}")
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def _scan_job():
+    try:
+        run_scan(MODEL)
+    except Exception as e:
+        print(f"Scan cycle failed: {e}")
+
+
+def start_scheduler(interval: int = SCAN_INTERVAL):
+    sched = BlockingScheduler()
+    sched.add_job(_scan_job, "interval", seconds=interval, max_instances=1, coalesce=True,
+                  next_run_time=datetime.now(), id="run_scan")
+    sched.start()
+
+
+if __name__ == "__main__":
+    if _HAS_APSCHEDULER:
+        start_scheduler()
+    else:
+        asyncio.run(main())
@@ -1,30 +1,46 @@
 # ==============================
 # FILE: app/scan.py (updated)
 # ==============================
+import json
 import os
 from datetime import datetime, timedelta, timezone, time as dtime, date
-from typing import List, Set
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
 
+import numpy as np
 import pandas as pd
+import requests
 from dotenv import load_dotenv
+from sqlalchemy import text
 
-from app.models import SessionLocal, engine, Base, Signal, Outcome
+from app.models import SessionLocal, engine, Signal, Outcome
 from app.polygon_api import (
-    get_ohlcv, get_ohlcv_intraday, get_company_name, get_diversified_universe,
+    fetch_many_ohlcv, get_grouped_ohlcv_range, split_grouped_by_ticker,
+    get_company_name, get_diversified_universe,
 )
 from app.indicator_utils import (
-    calculate_indicators, detect_strategies,
-    calculate_support_resistance, detect_candles,
+    indicator_arrays, detect_strategies,
+    calculate_support_resistance, detect_candles, screen_candles,
+    seed_indicator_state, advance_indicator_state,
 )
 from app.ml_utils import load_model
 from app.ranker import ask_gpt_top5
 
+# Optional columnar copy of each cycle's signals (see save_signals_to_parquet)
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    _HAS_ARROW = True
+except Exception:
+    _HAS_ARROW = False
+
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_FILE = os.path.join(BASE_DIR, "ml_stock_model.pkl")
 SIGNALS_DIR = "signals_data"
 HORIZON_DAYS_DEFAULT = 10
+FEATURE_COLUMNS = ["rsi", "macd", "macd_signal", "ema5", "ema20", "volume"]  # model input order
 
 # --- selection knobs ---
 USE_INTRADAY = True           # short-term mode on 15/30-min bars
@@ -32,6 +48,26 @@ INTRADAY_MULTIPLIER = 15      # 15-minute bars as requested
 BATCH_SIZE = 800              # 500–1000; tune to infra limits
 MIN_PER_SECTOR = 40           # sector spread (min)
 MAX_PER_SECTOR = 120          # sector spread (prep cap used by get_diversified_universe)
+SCAN_WORKERS = min(8, os.cpu_count() or 1)  # threads for per-ticker indicator compute
+
+# ticker -> (timestamp, close, volume) of the latest bar evaluated by a previous
+# cycle (process-local; app.runner keeps it across cycles). Unchanged bars give
+# an unchanged result. Recorded only once a cycle has committed; LRU-bounded.
+_LAST_BAR_SEEN: "OrderedDict[str, tuple]" = OrderedDict()
+_LAST_BAR_SEEN_MAX = 5000
+
+
+def _remember_bars(bars: dict) -> None:
+    for t, bar in bars.items():
+        _LAST_BAR_SEEN[t] = bar
+        _LAST_BAR_SEEN.move_to_end(t)
+    while len(_LAST_BAR_SEEN) > _LAST_BAR_SEEN_MAX:
+        _LAST_BAR_SEEN.popitem(last=False)
+
+# Tickers that keep coming back without bars (delisted/renamed) are skipped for a while
+BAD_TICKERS_FILE = os.path.join(BASE_DIR, "bad_tickers.json")
+BAD_TICKER_STRIKES = 3        # consecutive days with empty fetches before a ticker is skipped
+BAD_TICKER_RETRY_DAYS = 30    # retry it once its last strike is this old
 
 # London tz
 try:
@@ -52,6 +88,19 @@ def in_trading_window(now_utc: datetime) -> tuple[bool, str]:
     return within, window_tag
 
 
+def notify_api_cache():
+    """Best-effort: tell the API to drop its cached /signals bodies (set API_BASE_URL and INTERNAL_TOKEN to enable)."""
+    base = os.getenv("API_BASE_URL")
+    token = os.getenv("INTERNAL_TOKEN")
+    if not base or not token:
+        return
+    headers = {"X-Internal-Token": token}
+    try:
+        requests.post(f"{base.rstrip('/')}/internal/cache/invalidate", headers=headers, timeout=3)
+    except Exception as e:
+        print(f"Cache invalidate failed: {e}")
+
+
 def ensure_dirs():
     if not os.path.exists(SIGNALS_DIR):
         os.makedirs(SIGNALS_DIR)
@@ -60,25 +109,90 @@ def ensure_dirs():
 def save_signals_to_csv(signals_rows: List[dict], filename: str):
     if not signals_rows:
         return
-    df = pd.DataFrame(signals_rows)
-    file_exists = os.path.isfile(filename)
-    df.to_csv(filename, mode="a", header=not file_exists, index=False)
+    # One append handle: header only when the file is new/empty, no separate isfile check
+    with open(filename, "a", newline="") as f:
+        pd.DataFrame.from_records(signals_rows).to_csv(f, header=f.tell() == 0, index=False)
+
+
+def save_signals_to_parquet(signals_rows: List[dict], now_utc: datetime):
+    """
+    One compressed Parquet part per cycle, Hive-partitioned by day
+    (signals_data/parquet/date=YYYY-MM-DD/part-HHMMSS.parquet), for analytics
+    reads across weeks of scans. Needs pyarrow; the CSV stays for tailing.
+    """
+    if not signals_rows or not _HAS_ARROW:
+        return
+    part_dir = os.path.join(SIGNALS_DIR, "parquet", f"date={now_utc.strftime('%Y-%m-%d')}")
+    os.makedirs(part_dir, exist_ok=True)
+    path = os.path.join(part_dir, f"part-{now_utc.strftime('%H%M%S')}.parquet")
+    pd.DataFrame.from_records(signals_rows).to_parquet(path, index=False)
+
+
+_SCANNED_TODAY_SQL = text("SELECT DISTINCT ticker FROM signals WHERE created_at >= :start")
+
+
+def ensure_indexes():
+    """Covering index for the same-day ticker lookup (index-only scan on Postgres)."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_signals_created_at_ticker ON signals (created_at, ticker)"
+        ))
 
 
 def _tickers_scanned_today(db) -> Set[str]:
     today = date.today()
     start_utc = datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
-    rows = db.execute(
-        """
-        SELECT DISTINCT ticker FROM signals
-        WHERE created_at >= :start
-        """,
-        {"start": start_utc}
-    ).fetchall()
+    rows = db.execute(_SCANNED_TODAY_SQL, {"start": start_utc}).fetchall()
     return {r[0] for r in rows}
 
 
-def pick_next_batch(db, batch_size=BATCH_SIZE, min_per_sector=MIN_PER_SECTOR, max_per_sector=MAX_PER_SECTOR) -> pd.DataFrame:
+def _load_bad_tickers() -> dict:
+    """ticker -> {"strikes": n, "last": "YYYY-MM-DD"}: days in a row its fetch came back empty."""
+    try:
+        with open(BAD_TICKERS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _skipped_tickers(strikes: dict) -> Set[str]:
+    cutoff = (date.today() - timedelta(days=BAD_TICKER_RETRY_DAYS)).isoformat()
+    return {t for t, e in strikes.items() if e.get("strikes", 0) >= BAD_TICKER_STRIKES and e.get("last", "") >= cutoff}
+
+
+def _is_missing(df) -> bool:
+    if isinstance(df, Exception):
+        # only "no such ticker" counts; rate limits/timeouts are transient
+        return getattr(getattr(df, "response", None), "status_code", None) == 404
+    return df is None or df.empty
+
+
+def _update_bad_tickers(strikes: dict, tickers: List[str], frames: dict) -> None:
+    if not any(isinstance(frames.get(t), pd.DataFrame) and not frames[t].empty for t in tickers):
+        return  # whole batch came back empty: an outage, not bad tickers
+    today = date.today().isoformat()
+    changed = False
+    for t in tickers:
+        if _is_missing(frames.get(t)):
+            e = strikes.setdefault(t, {"strikes": 0})
+            if e.get("last") != today:  # at most one strike per day
+                e["strikes"] = e.get("strikes", 0) + 1
+                e["last"] = today
+                changed = True
+        elif not isinstance(frames.get(t), Exception) and strikes.pop(t, None) is not None:
+            changed = True
+    if changed:
+        tmp = BAD_TICKERS_FILE + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(strikes, f)
+            os.replace(tmp, BAD_TICKERS_FILE)
+        except OSError as e:
+            print(f"Could not save bad tickers: {e}")
+
+
+def pick_next_batch(db, batch_size=BATCH_SIZE, min_per_sector=MIN_PER_SECTOR, max_per_sector=MAX_PER_SECTOR,
+                    already: Optional[Set[str]] = None) -> pd.DataFrame:
     """
     1) Build diversified, ranked universe (ETF-excluded, mcap/price filtered),
        with true relative volume and true gap.
@@ -87,22 +201,20 @@ def pick_next_batch(db, batch_size=BATCH_SIZE, min_per_sector=MIN_PER_SECTOR, ma
 
     RETURNS: DataFrame with at least columns [ticker, sector].
     """
-    uni = get_diversified_universe(sector_cap=max_per_sector, use_history=True, history_limit=1500)
+    uni = get_diversified_universe(sector_cap=max_per_sector, use_history=True, history_limit=1500, cache_minutes=60)
     if not isinstance(uni, pd.DataFrame) or uni.empty:
         return pd.DataFrame(columns=["ticker", "sector"])  # empty frame for safety
 
-    already = _tickers_scanned_today(db)
-    fresh = uni[~uni["ticker"].isin(already)].copy()
+    if already is None:
+        already = _tickers_scanned_today(db)
+    fresh = uni[~uni["ticker"].isin(already)].drop_duplicates("ticker")
 
-    # Sector spread by score
-    picks = []
-    for sector, g in fresh.groupby("sector"):
-        g = g.sort_values(["score", "pct_change_abs"], ascending=[False, False])
-        take = min(min_per_sector, len(g))
-        if take > 0:
-            picks.append(g.head(take)[["ticker", "sector", "score"]])
-
-    selected = pd.concat(picks, ignore_index=True) if picks else pd.DataFrame(columns=["ticker", "sector", "score"])
+    # Sector spread by score: top min_per_sector of each sector in one sort
+    selected = (
+        fresh.sort_values(["sector", "score", "pct_change_abs"], ascending=[True, False, False])
+        .groupby("sector", observed=True).head(min_per_sector)[["ticker", "sector", "score"]]
+        .reset_index(drop=True)
+    )
 
     # Fill remainder by score across all sectors
     if len(selected) < batch_size:
@@ -114,73 +226,188 @@ def pick_next_batch(db, batch_size=BATCH_SIZE, min_per_sector=MIN_PER_SECTOR, ma
     return selected.reset_index(drop=True)
 
 
-def run_scan():
+def process_ticker(ticker: str, sector_from_universe, df, candle_tags: Optional[List[str]] = None) -> Optional[dict]:
+    """
+    Candles, levels, indicators and tags for one ticker's bars.
+    `candle_tags` may come from the batch `screen_candles` pass; they are
+    detected here otherwise. Returns the entry to score, or None if skipped.
+    """
+    try:
+        if isinstance(df, Exception):
+            raise df
+        if df is None or df.empty or len(df) < 30:
+            return None
+
+        # Candles and levels only need OHLC, so check them before any indicator work
+        if candle_tags is None:
+            candle_tags = detect_candles(df)
+        if not candle_tags:
+            return None
+        support, resistance = calculate_support_resistance(df)
+
+        # Only the last bar (and the one before it, for crossovers) is used, so
+        # read plain ndarray columns instead of building full indicator frames.
+        cols = {c: df[c].to_numpy(dtype=np.float64) for c in ("Open", "High", "Low", "Close", "Volume")}
+        bar = {c: a[-1] for c, a in cols.items()}
+
+        # Intraday rescans advance cached per-ticker indicator state over the
+        # new bars only (first-seen tickers are seeded once from the completed
+        # bars); the forming last bar is applied on top without being stored.
+        if USE_INTRADAY:
+            warm = advance_indicator_state(ticker, df)
+            if warm is None:
+                seed_indicator_state(ticker, df)
+                warm = advance_indicator_state(ticker, df)
+            if warm is None:
+                return None  # too few bars to seed the indicator state
+            values, prev = warm
+            latest = {**bar, **values}
+        else:
+            ind = indicator_arrays(cols["Close"])
+            latest = {**bar, **{k: a[-1] for k, a in ind.items()}}
+            prev = {k: a[-2] for k, a in ind.items()}
+        strategy_tags = detect_strategies(latest, prev)
+        # Strategy and candle tags are disjoint and each list is already unique,
+        # so a plain concat needs no set round-trip (and keeps a stable order).
+        all_tags = strategy_tags + candle_tags
+
+        features = {
+            "rsi": float(latest["rsi"]),
+            "macd": float(latest["macd"]),
+            "macd_signal": float(latest["macd_signal"]),
+            "ema5": float(latest["ema5"]),
+            "ema20": float(latest["ema20"]),
+            "volume": float(latest["Volume"]),
+        }
+        if any(pd.isna(v) for v in features.values()):
+            return None  # latest bar still inside an indicator warm-up window
+
+        return {
+            "ticker": ticker,
+            "sector": sector_from_universe,
+            "features": features,
+            "strategy_tags": strategy_tags,
+            "candle_tags": candle_tags,
+            "all_tags": all_tags,
+            "support": support,
+            "resistance": resistance,
+            "price_now": float(latest["Close"]),
+        }
+
+    except Exception as e:
+        print(f"Error processing {ticker}: {e}")
+        return None
+
+
+def run_scan(model=None):
+    """One scan cycle. Long-running callers can pass a preloaded `model`."""
     now_utc = datetime.now(timezone.utc)
     within, window_tag = in_trading_window(now_utc)
     if not within:
         print("Outside London trading window. Skipping this run.")
         return
 
-    if not os.path.exists(MODEL_FILE):
+    if model is None and not os.path.exists(MODEL_FILE):
         print(f"Model file not found at '{MODEL_FILE}'")
         return
 
     ensure_dirs()
-    model = load_model(MODEL_FILE)
+    try:
+        ensure_indexes()
+    except Exception as e:
+        print(f"Index check failed: {e}")
+    if model is None:
+        model = load_model(MODEL_FILE)
     db = SessionLocal()
 
     # diversified & rotating universe (no same-day duplicates)
-    selected = pick_next_batch(db, batch_size=BATCH_SIZE)
+    strikes = _load_bad_tickers()
+    selected = pick_next_batch(db, batch_size=BATCH_SIZE, already=_tickers_scanned_today(db) | _skipped_tickers(strikes))
     print(f"Universe size this cycle: {len(selected)}")
 
     candidates = []
     saved_rows_for_csv = []
     added_signals = []
 
-    for _, row in selected.iterrows():
-        ticker = row["ticker"]
-        sector_from_universe = row.get("sector", None)
+    # Fetch bars for the whole batch up front: concurrent per-ticker intraday
+    # requests, or one grouped-daily request per day in daily mode
+    tickers = selected["ticker"].tolist()
+    if not tickers:
+        frames = {}
+    elif USE_INTRADAY:
+        frames = fetch_many_ohlcv(tickers, intraday=True, multiplier=INTRADAY_MULTIPLIER, lookback_days=5)
+    else:
         try:
-            df = get_ohlcv_intraday(ticker, multiplier=INTRADAY_MULTIPLIER, lookback_days=5) if USE_INTRADAY else get_ohlcv(ticker, days=60)
-            if df.empty or len(df) < 30:
-                continue
-
-            df = calculate_indicators(df)
-            support, resistance = calculate_support_resistance(df)
-            candle_tags = detect_candles(df)
-            if not candle_tags:
-                continue
-
-            latest = df.iloc[-1]
-            strategy_tags = detect_strategies(latest)
-            all_tags = list(set(strategy_tags + candle_tags))
-
-            features = {
-                "rsi": float(latest["rsi"]),
-                "macd": float(latest["macd"]),
-                "macd_signal": float(latest["macd_signal"]),
-                "ema5": float(latest["ema5"]),
-                "ema20": float(latest["ema20"]),
-                "volume": float(latest["Volume"]),
-            }
-            X = pd.DataFrame([features])
-            proba = float(model.predict_proba(X)[0][1])
-            price_now = float(latest["Close"])
+            grouped = get_grouped_ohlcv_range(now_utc - timedelta(days=60), now_utc)
+        except (requests.RequestException, ValueError) as e:
+            # A missing session would skew every indicator; retry next cycle
+            print(f"Grouped daily fetch failed, skipping this cycle: {e}")
+            db.close()
+            return
+        frames = split_grouped_by_ticker(grouped, tickers)
+    _update_bad_tickers(strikes, tickers, frames)
+
+    sectors = selected["sector"].tolist() if "sector" in selected else [None] * len(tickers)
+    # Vectorized candle pre-screen across the batch: tickers whose latest bar
+    # has no pattern would be dropped anyway, so skip them before any indicator
+    # work. Fetch errors stay in so process_ticker still reports them.
+    #
+    # Diff-only rescan: a ticker whose latest bar is the one a previous cycle
+    # already evaluated (market closed, holiday, illiquid name) would produce
+    # the same outcome again, so it is skipped outright.
+    latest_bars = {
+        t: (df.index[-1], float(df["Close"].iat[-1]), float(df["Volume"].iat[-1]))  # a still-forming bar changes close/volume
+        for t, df in frames.items() if isinstance(df, pd.DataFrame) and not df.empty
+    }
+    unchanged = {t for t, ts in latest_bars.items() if _LAST_BAR_SEEN.get(t) == ts}
+    evaluated = {t: ts for t, ts in latest_bars.items() if t not in unchanged}
+    if unchanged:
+        print(f"Skipping {len(unchanged)} tickers with no new bars since last cycle.")
+    hits = screen_candles({t: df for t, df in frames.items() if t not in unchanged})
+    keep = [(t, s) for t, s in zip(tickers, sectors)
+            if t in hits or (t not in unchanged and not isinstance(frames.get(t), pd.DataFrame))]
+    # Per-ticker compute runs on a thread pool; DB writes stay on this thread.
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        results = pool.map(lambda ts: process_ticker(ts[0], ts[1], frames.get(ts[0]), hits.get(ts[0])), keep)
+        pending = [r for r in results if r is not None]
+
+    # Score all tickers with a single predict_proba call instead of one per ticker.
+    # The float64 matrix is only wrapped in a DataFrame for estimators fit with
+    # feature names; other backends (e.g. the ONNX export) take it as-is.
+    if pending:
+        X = np.array([[p["features"][c] for c in FEATURE_COLUMNS] for p in pending], dtype=np.float64)
+        if hasattr(model, "feature_names_in_"):
+            X = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        probas = model.predict_proba(X)[:, 1]
+    else:
+        probas = []
+
+    # Shared by every signal in this cycle: format once, not per row
+    created_at = now_utc.isoformat()
+    timeframe = f"{INTRADAY_MULTIPLIER}m" if USE_INTRADAY else "1d"
+
+    for p, proba in zip(pending, probas):
+        ticker = p["ticker"]
+        try:
+            proba = float(proba)
+            price_now = p["price_now"]
+            support, resistance = p["support"], p["resistance"]
+            all_tags = p["all_tags"]
 
             indicators_json = {
-                "features": features,
-                "strategy_tags": strategy_tags,
-                "candle_tags": candle_tags,
+                "features": p["features"],
+                "strategy_tags": p["strategy_tags"],
+                "candle_tags": p["candle_tags"],
                 "all_tags": all_tags,
                 "support": support,
                 "resistance": resistance,
                 "ml_proba": proba,
-                "timeframe": (f"{INTRADAY_MULTIPLIER}m" if USE_INTRADAY else "1d"),
+                "timeframe": timeframe,
             }
 
             # --- NEW: ensure Sector is always present on the card ---
             # Prefer sector from the diversified universe; fall back to any existing indicator hint.
-            sector = sector_from_universe or indicators_json.get("sector")
+            sector = p["sector"] or indicators_json.get("sector")
             if sector:
                 indicators_json["sector"] = sector
 
@@ -194,12 +421,10 @@ def run_scan():
                 horizon_days=HORIZON_DAYS_DEFAULT,
                 window_tag=window_tag,
             )
-            db.add(sig)
-            db.flush()
             added_signals.append(sig)
 
             saved_rows_for_csv.append({
-                "created_at": now_utc.isoformat(),
+                "created_at": created_at,
                 "window_tag": window_tag,
                 "ticker": ticker,
                 "sector": sector or "Unknown",
@@ -208,7 +433,7 @@ def run_scan():
                 "tags": ",".join(all_tags),
                 "support": support,
                 "resistance": resistance,
-                "timeframe": (f"{INTRADAY_MULTIPLIER}m" if USE_INTRADAY else "1d"),
+                "timeframe": timeframe,
             })
 
             if proba >= 0.60:
@@ -219,12 +444,19 @@ def run_scan():
                     "resistance": resistance,
                     "indicators_json": indicators_json,
                     "ml_confidence": proba,
-                    "signal_id": str(sig.id),
+                    "signal": sig,  # swapped for signal_id once ids are assigned
                 })
 
         except Exception as e:
             print(f"Error processing {ticker}: {e}")
 
+    # One flush for the whole batch: SQLAlchemy groups the INSERTs into
+    # multi-row statements (with RETURNING for ids) instead of one per signal.
+    db.add_all(added_signals)
+    db.flush()
+    for c in candidates:
+        c["signal_id"] = str(c.pop("signal").id)
+
     top5 = ask_gpt_top5(candidates, horizon_days=HORIZON_DAYS_DEFAULT) if candidates else []
     print(f"GPT selected {len(top5)} top picks.")
 
@@ -276,11 +508,18 @@ def run_scan():
         db.add(outcome)
 
     db.commit()
+    # Only now are this cycle's bars done with; a failed cycle re-evaluates them
+    _remember_bars(evaluated)
     print(f"Saved {len(added_signals)} signals; flagged {len(top5)} as Top 5.")
+    notify_api_cache()
 
     if saved_rows_for_csv:
         fname = os.path.join(SIGNALS_DIR, f"signals_{now_utc.strftime('%Y-%m-%d')}.csv")
         save_signals_to_csv(saved_rows_for_csv, fname)
+        try:
+            save_signals_to_parquet(saved_rows_for_csv, now_utc)
+        except Exception as e:
+            print(f"Parquet export failed: {e}")
 
     db.close()
 
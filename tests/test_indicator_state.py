@@ -0,0 +1,71 @@
+# app/tests/test_indicator_state.py
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+from app.indicator_utils import advance_indicator_state, indicator_arrays, seed_indicator_state
+
+KEYS = ("rsi", "ema5", "ema20", "macd", "macd_signal", "bb_mid", "bb_high", "bb_low")
+
+
+def _frame(n=120, seed=0):
+    close = 100 + np.random.default_rng(seed).normal(0, 1, n).cumsum()
+    return pd.DataFrame({"Close": close}, index=pd.date_range("2026-01-05 14:30", periods=n, freq="15min"))
+
+
+def _daily(df):
+    ind = indicator_arrays(df["Close"].to_numpy(dtype=np.float64))
+    return {k: a[-1] for k, a in ind.items()}, {k: a[-2] for k, a in ind.items()}
+
+
+def _assert_same(got, want):
+    for k in KEYS:
+        assert got[k] == pytest.approx(want[k], rel=1e-9, abs=1e-9), k
+
+
+def test_cold_state_matches_daily():
+    df = _frame()
+    seed_indicator_state("COLD", df)
+    latest, prev = advance_indicator_state("COLD", df)
+    want_latest, want_prev = _daily(df)
+    _assert_same(latest, want_latest)
+    _assert_same(prev, want_prev)
+
+
+def test_warm_state_matches_daily():
+    df = _frame()
+    seed_indicator_state("WARM", df.iloc[:100])
+    advance_indicator_state("WARM", df.iloc[:100])
+    # next cycle: the forming bar has moved on and new bars were appended
+    latest, prev = advance_indicator_state("WARM", df)
+    want_latest, want_prev = _daily(df)
+    _assert_same(latest, want_latest)
+    _assert_same(prev, want_prev)
+
+
+def test_revised_close_forces_reseed():
+    df = _frame()
+    seed_indicator_state("REV", df.iloc[:100])
+    revised = df.copy()
+    revised.iloc[98, 0] += 1.0
+    assert advance_indicator_state("REV", revised) is None
+
+
+def test_daily_matches_ta_package():
+    close = _frame()["Close"]
+    ind = indicator_arrays(close.to_numpy(dtype=np.float64))
+    macd = ta.trend.MACD(close=close)
+    bb = ta.volatility.BollingerBands(close=close, window=20, window_dev=2)
+    want = {
+        "rsi": ta.momentum.RSIIndicator(close=close, window=14).rsi(),
+        "ema5": ta.trend.EMAIndicator(close=close, window=5).ema_indicator(),
+        "ema20": ta.trend.EMAIndicator(close=close, window=20).ema_indicator(),
+        "macd": macd.macd(),
+        "macd_signal": macd.macd_signal(),
+        "bb_mid": bb.bollinger_mavg(),
+        "bb_high": bb.bollinger_hband(),
+        "bb_low": bb.bollinger_lband(),
+    }
+    for k in KEYS:
+        np.testing.assert_allclose(ind[k][40:], want[k].to_numpy()[40:], rtol=1e-9, err_msg=k)
@@ -1,4 +1,5 @@
 import joblib
+import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 import pandas as pd
 
@@ -20,3 +21,31 @@ model.fit(X, y)
 
 joblib.dump(model, "ml_stock_model.pkl")
 print("✅ Model trained with feature names and saved.")
+
+# Plain tree arrays for ml_utils.CompiledTree, so serving doesn't need sklearn
+t = model.tree_
+value = t.value[:, 0, :].astype(np.float64)
+if not np.allclose(value.sum(axis=1), 1.0):
+    value = value / value.sum(axis=1, keepdims=True)  # older sklearn stores class counts
+np.savez(
+    "ml_stock_model.npz",
+    left=t.children_left,
+    right=t.children_right,
+    feature=t.feature,
+    threshold=t.threshold,
+    leaf_proba=value,
+    classes=model.classes_,
+    feature_names=np.asarray(model.feature_names_in_, dtype=str),
+)
+print("✅ Tree arrays saved.")
+
+# Optional: compiled export for ONNX Runtime (picked up by ml_utils.load_model)
+try:
+    from skl2onnx import to_onnx
+
+    onx = to_onnx(model, X.to_numpy(dtype=np.float32), options={"zipmap": False})
+    with open("ml_stock_model.onnx", "wb") as f:
+        f.write(onx.SerializeToString())
+    print("✅ ONNX export saved.")
+except ImportError:
+    pass